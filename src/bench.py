@@ -0,0 +1,124 @@
+"""
+Headless frame-time benchmark for the matrix rain.
+
+Runs MatrixRain under SDL's dummy video driver for every combination of the given
+resolutions, font sizes, rain densities and renderers, and prints the results as JSON.
+Every case runs in its own process, so its peak RSS isn't the peak of the cases before it:
+
+    python bench.py --resolutions 1080p 4K --renderers full dirty --frames 300
+    python bench.py --resolutions 4K --renderers full --threads 1 2 4 8
+"""
+import os
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import contextlib
+import itertools
+import json
+import multiprocessing
+import resource
+import sys
+import time
+
+import numpy as np
+import pygame
+
+from rain import MatrixRain, RENDERERS
+
+RESOLUTIONS = {
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4K": (3840, 2160),
+    "8K": (7680, 4320),
+}
+
+
+def peak_rss_mib():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB everywhere else
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_case(resolution, font_size, max_rains, renderer, threads, frames, warmup, seed):
+    width, height = RESOLUTIONS[resolution]
+    screen = pygame.display.set_mode((width, height))
+    rain = MatrixRain(width, height, font_size=font_size, renderer=renderer, max_rains=max_rains, seed=seed, threads=threads)
+
+    times = []
+    for frame in range(warmup + frames):
+        start = time.perf_counter()
+        rain.step()
+        rects = rain.render(screen)
+        if renderer == "dirty":
+            pygame.display.update(rects)
+        else:
+            pygame.display.flip()
+        if frame >= warmup:
+            times.append(time.perf_counter() - start)
+    rain.close()
+
+    times = np.array(times) * 1000
+    return {
+        "resolution": resolution,
+        "width": width,
+        "height": height,
+        "font_size": font_size,
+        "max_rains": max_rains,
+        "renderer": renderer,
+        "threads": threads,
+        "frames": frames,
+        "p50_ms": round(float(np.percentile(times, 50)), 3),
+        "p95_ms": round(float(np.percentile(times, 95)), 3),
+        "p99_ms": round(float(np.percentile(times, 99)), 3),
+        "fps": round(1000 / float(times.mean()), 1),
+        "live_rains": rain.live_rains,
+        "trail_cells": rain.trail_cells,
+        "peak_rss_mib": round(peak_rss_mib(), 1),
+    }
+
+
+def run_isolated(*case):
+    """run_case() in a fresh process, so ru_maxrss is that case's own peak."""
+    pygame.init()
+    # Keep the engine's own debug output out of the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        result = run_case(*case)
+    pygame.quit()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark matrix rain frame times without a display")
+    parser.add_argument("--resolutions", nargs="+", choices=RESOLUTIONS, default=["1080p", "1440p", "4K", "8K"])
+    parser.add_argument("--font-sizes", nargs="+", type=int, default=[20])
+    parser.add_argument("--rains", nargs="+", type=int, default=[5], help="Maximum rains per column")
+    parser.add_argument("--renderers", nargs="+", choices=RENDERERS, default=list(RENDERERS))
+    parser.add_argument("--threads", nargs="+", type=int, default=[1], help="Worker threads of the full renderer")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    # spawn rather than fork, so a child doesn't start with the parent's memory or SDL state
+    context = multiprocessing.get_context("spawn")
+    results = []
+    cases = itertools.product(args.resolutions, args.font_sizes, args.rains, args.renderers, args.threads)
+    for resolution, font_size, max_rains, renderer, threads in cases:
+        if threads > 1 and renderer != "full":
+            continue
+        print(f"[DEBUG] {resolution} font {font_size} rains {max_rains} {renderer} threads {threads}", file=sys.stderr)
+        with context.Pool(1) as pool:
+            results.append(pool.apply(run_isolated, (resolution, font_size, max_rains, renderer, threads, args.frames, args.warmup, args.seed)))
+
+    report = json.dumps({"python": sys.version.split()[0], "pygame": pygame.version.ver, "results": results}, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,46 +2,316 @@ import pygame
 import time
 import sys
 import io
+import os
+import atexit
+import gzip
+import shutil
+import threading
+from collections import OrderedDict
 
-from objc import bool_property
+MOUSE_EVENTS = frozenset((pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEWHEEL))
 
 pygame.init()
 
+# --- Font and text caches ---
+# SysFont looks the font up on disk, which is slow on macOS, so every (name, size) is loaded once
+_fonts = {}
+_font_lock = threading.Lock()
+
+
+def get_font(name, size):
+    with _font_lock:
+        font = _fonts.get((name, size))
+        if font is None:
+            font = _fonts[(name, size)] = pygame.font.SysFont(name, size)
+        return font
+
+
+class TextCache:
+    """
+    An LRU of rendered text surfaces, keyed by (font name, size, text, colour, antialias).
+    Holds at most `max_entries` surfaces. `hits` and `misses` count lookups since the start.
+    Widgets must not draw onto the surfaces they get, since they are shared.
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+        self._lock = threading.Lock()  # Buttons change their text from launch_loop's thread too
+
+    def render(self, font_name, size, text, color, antialias=True):
+        key = (font_name, size, text, color if isinstance(color, tuple) else tuple(pygame.Color(color)), bool(antialias))
+        # Held while rendering too: the fonts are shared, and a Font must not render on two threads at once
+        with self._lock:
+            surface = self._surfaces.get(key)
+            if surface is not None:
+                self._surfaces.move_to_end(key)
+                self.hits += 1
+                return surface
+            self.misses += 1
+            surface = get_font(font_name, size).render(text, antialias, color)
+            self._surfaces[key] = surface
+            if len(self._surfaces) > self.max_entries:
+                self._surfaces.popitem(last=False)
+            return surface
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "fonts": len(_fonts),
+            "entries": len(self._surfaces),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+text_cache = TextCache()
+render_text = text_cache.render
+
 class BasePoolObject:
+    """
+    Something the ObjectPool updates and draws.
+
+    Objects that implement render(state) are drawn retained-mode: the (surface, position) it
+    returns is kept per state() and blitted as is until appearance() changes. Objects that don't
+    can override draw(win) instead.
+    """
+    # True when the object looks different from the last time it was drawn
+    dirty = True
+    # Event types update() gets from an ObjectPool, None for all of them. Mouse events only come
+    # while the mouse is over hit_rect(), unless their type is in events_anywhere too.
+    events = None
+    events_anywhere = frozenset()
+    # Whether update() is called on every pool update, even without events, e.g. to blink a cursor
+    ticks = False
+    # Objects with a higher z are drawn on top, and get the mouse first where they overlap
+    z = 0
+    # Pre-rendered (surface, position) per visual state, for the appearance they were rendered with
+    _surfaces = None
+    _appearance = None
+    # Surfaces rendered by every object together, to see how often the caches miss
+    renders = 0
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def invalidate(self):
+        """Drops the pre-rendered surfaces, so the next draw renders them again."""
+        self._surfaces = None
+        self.dirty = True
+
     def update(self, events):
         """Override this in subclasses to handle per-frame updates."""
         pass
 
+    def hit_rect(self):
+        """The area mouse events are routed to the object for, or None to get them anywhere."""
+        return getattr(self, "rect", None)
+
+    def state(self):
+        """Name of the visual state the object is in, e.g. "hovered"."""
+        return "normal"
+
+    def appearance(self):
+        """Everything besides the state that changes how the object looks, e.g. text, colours and rect."""
+        return ()
+
+    def render(self, state):
+        """Returns a (surface, position) of the object in `state`, or None if it draws itself in draw()."""
+        return None
+
+    def blit_list(self):
+        """The (surface, position) pairs to blit for the object as it is now, or None if it has no render()."""
+        appearance = self.appearance()
+        if self._surfaces is None or appearance != self._appearance:
+            self._surfaces = {}
+            self._appearance = appearance
+        state = self.state()
+        if state not in self._surfaces:
+            self._surfaces[state] = self.render(state)
+            BasePoolObject.renders += 1
+        cached = self._surfaces[state]
+        return [cached] if cached else None
+
     def draw(self, win):
-        pass
+        blits = self.blit_list()
+        if blits:
+            win.blits(blits, doreturn=False)
 
 
 class ObjectPool:
-    def __init__(self):
-        self.objects = []
+    """
+    Holds objects in z-order, and hands each one only the events it subscribed to.
+
+    Mouse events are routed through a uniform grid of `cell_size` pixel cells over the objects'
+    hit rects, so finding the object under the mouse doesn't depend on how many objects there
+    are. Only the topmost object under the mouse gets a mouse event, and an object the mouse
+    moved off gets that MOUSEMOTION too. Adding and removing objects don't scan the pool.
+    Call reindex(obj) after moving or resizing an object.
+    """
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self._objects = {}  # Object -> order it was added in
+        self._added = 0
+        self._ordered = []  # Objects sorted by (z, order added), rebuilt after changes
+        self._reorder = False
+        self._cells = {}  # (column, row) -> {object: None}
+        self._object_cells = {}  # Object -> the cells it is in
+        self._subscribers = {}  # Event type -> {object: None}, for non-mouse events
+        self._anywhere = {}  # Mouse event type -> {object: None}, for objects that get it anywhere
+        self._unrouted = {}  # Objects that get every event
+        self._ticking = {}
+        self._hovered = None  # Topmost object the mouse was last over
+        self._changed = True  # Objects were added or removed since the last draw
+
+    @property
+    def objects(self):
+        if self._reorder:
+            self._ordered = sorted(self._objects, key=lambda obj: (obj.z, self._objects[obj]))
+            self._reorder = False
+        return self._ordered
+
+    @property
+    def dirty(self):
+        return self._changed or any(obj.dirty for obj in self._objects)
+
+    @dirty.setter
+    def dirty(self, value):
+        # For owners that draw the objects themselves instead of calling draw()
+        self._changed = value
+        if not value:
+            for obj in self._objects:
+                obj.dirty = False
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __contains__(self, obj):
+        return obj in self._objects
+
+    def _cells_of(self, rect):
+        if rect.width <= 0 or rect.height <= 0:
+            return []
+        size = self.cell_size
+        return [
+            (column, row)
+            for column in range(rect.left // size, (rect.right - 1) // size + 1)
+            for row in range(rect.top // size, (rect.bottom - 1) // size + 1)
+        ]
+
+    def _index(self, obj):
+        rect = obj.hit_rect()
+        cells = self._cells_of(pygame.Rect(rect)) if rect is not None and obj.events is not None else []
+        for cell in cells:
+            self._cells.setdefault(cell, {})[obj] = None
+        self._object_cells[obj] = cells
+
+    def _unindex(self, obj):
+        for cell in self._object_cells.pop(obj, []):
+            del self._cells[cell][obj]
+            if not self._cells[cell]:
+                del self._cells[cell]
 
     def add(self, obj: BasePoolObject):
         if not isinstance(obj, BasePoolObject):
             raise TypeError(f"Expected 'BasePoolObject', but got '{obj.__class__.__name__}'")
-        self.objects.append(obj)
+        if obj in self._objects:
+            return
+        self._objects[obj] = self._added
+        self._added += 1
+        self._reorder = True
+        self._changed = True
+        if obj.events is None:
+            self._unrouted[obj] = None
+        else:
+            for event_type in obj.events:
+                if event_type not in MOUSE_EVENTS:
+                    self._subscribers.setdefault(event_type, {})[obj] = None
+            for event_type in obj.events_anywhere:
+                self._anywhere.setdefault(event_type, {})[obj] = None
+        if obj.ticks:
+            self._ticking[obj] = None
+        self._index(obj)
 
     def remove(self, obj: BasePoolObject):
-        if obj in self.objects:
-            self.objects.remove(obj)
+        if obj not in self._objects:
+            return
+        del self._objects[obj]
+        self._reorder = True
+        self._changed = True
+        self._unrouted.pop(obj, None)
+        self._ticking.pop(obj, None)
+        for subscribers in (*self._subscribers.values(), *self._anywhere.values()):
+            subscribers.pop(obj, None)
+        self._unindex(obj)
+        if self._hovered is obj:
+            self._hovered = None
+
+    def reindex(self, obj: BasePoolObject):
+        """Moves obj to the cells of its current hit rect."""
+        if obj in self._objects:
+            self._unindex(obj)
+            self._index(obj)
 
     def clear(self):
-        self.objects.clear()
+        self.__init__(self.cell_size)
+
+    def object_at(self, pos, event_type=None):
+        """The topmost object whose hit rect contains `pos`, and that subscribed to `event_type` if given."""
+        x, y = pos
+        top = None
+        for obj in self._cells.get((int(x) // self.cell_size, int(y) // self.cell_size), ()):
+            if event_type is not None and event_type not in obj.events:
+                continue
+            if pygame.Rect(obj.hit_rect()).collidepoint(x, y):
+                if top is None or (obj.z, self._objects[obj]) > (top.z, self._objects[top]):
+                    top = obj
+        return top
 
     def update(self, events):
-        for obj in self.objects:
-            obj.update(events)
+        received = {}  # Object -> its events, in the order they came
+        for event in events:
+            if event.type in MOUSE_EVENTS:
+                # MOUSEWHEEL has no position, it goes to whatever is under the mouse
+                pos = event.pos if hasattr(event, "pos") else pygame.mouse.get_pos()
+                targets = [*self._anywhere.get(event.type, ())]
+                top = self.object_at(pos, event.type)
+                if top is not None and top not in targets:
+                    targets.append(top)
+                if event.type == pygame.MOUSEMOTION:
+                    if self._hovered is not None and self._hovered is not top and self._hovered not in targets:
+                        targets.append(self._hovered)  # So it knows the mouse left
+                    self._hovered = top
+            else:
+                targets = self._subscribers.get(event.type, ())
+            for obj in (*targets, *self._unrouted):
+                received.setdefault(obj, []).append(event)
+        for obj in self._ticking:
+            received.setdefault(obj, [])
+        for obj, obj_events in received.items():
+            obj.update(obj_events)
 
     def draw(self, win):
+        """Blits every pre-rendered object in one call, only breaking the batch for objects that draw themselves."""
+        batch = []
         for obj in self.objects:
-            obj.draw(win)
+            blits = obj.blit_list()
+            if blits is None:
+                win.blits(batch, doreturn=False)
+                batch = []
+                obj.draw(win)
+            else:
+                batch += blits
+            obj.dirty = False
+        win.blits(batch, doreturn=False)
+        self._changed = False
 
 
 class Button(BasePoolObject):
+    events = frozenset((pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN))
+
     def __init__(self, x, y, width, height, color, hover_color, text_color, text, font_size=20, font="comicsans", roundness=10):
         self.text_rect = None
         self.text_surf = None
@@ -60,55 +330,72 @@ class Button(BasePoolObject):
 
         self.rect = pygame.Rect(x, y, width, height)
         self.rect.center = (x, y)
+        self._hovered = False  # Whether the mouse is over it, disabled or not
+        self._clicked = False
 
         self.change_text(text)
 
     def change_text(self, text):
         self.text = text
-        font = pygame.font.SysFont(self.font, self.font_size)
-        self.text_surf = font.render(self.text, 1, self.text_color)  # more speed
+        self.text_surf = render_text(self.font, self.font_size, self.text, self.text_color)
         self.text_rect = self.text_surf.get_rect(center=self.rect.center)
+        self.dirty = True
 
-    def draw(self, win):
+    def update(self, events):
+        self._clicked = False
+        for event in events:
+            inside = self.rect.collidepoint(event.pos)
+            if inside != self._hovered:
+                self._hovered = inside
+                self.dirty = True
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and inside and not self.disabled:
+                self._clicked = True
+
+    def state(self):
         if self.disabled:
-            color = (180, 180, 180)
-        elif self.is_hovered():
-            color = self.hover_color
-        else:
-            color = self.color
-        temp_surf = pygame.Surface(self.rect[2:], pygame.SRCALPHA)
-        temp_surf.fill((0, 0, 0, 0))
-        pygame.draw.rect(temp_surf, color, [0, 0, *self.rect[2:]], border_radius=self.roundness)
+            return "disabled"
+        return "hovered" if self.is_hovered() else "normal"
+
+    def appearance(self):
+        return self.color, self.hover_color, self.text_surf, tuple(self.rect), tuple(self.text_rect), self.roundness
 
-        win.blit(temp_surf, self.rect)
-        win.blit(self.text_surf, self.text_rect)
+    def render(self, state):
+        color = {"disabled": (180, 180, 180), "hovered": self.hover_color}.get(state, self.color)
+        area = self.rect.union(self.text_rect)  # Long text can stick out of the button
+        surface = pygame.Surface(area.size, pygame.SRCALPHA)
+        pygame.draw.rect(surface, color, self.rect.move(-area.x, -area.y), border_radius=self.roundness)
+        surface.blit(self.text_surf, self.text_rect.move(-area.x, -area.y))
+        return surface, area.topleft
 
     def is_hovered(self):
-        if self.disabled:
-            return False
-        pos = pygame.mouse.get_pos()
-        return self.rect.collidepoint(*pos)
+        return self._hovered and not self.disabled
 
     def is_clicked(self):
-        if self.disabled:
-            return False
-        buttons = pygame.mouse.get_pressed()
-        if not buttons[0]:
-            return False
-        return self.is_hovered()
+        """Whether it was clicked in the last update. Only the first call after the click returns True."""
+        clicked = self._clicked and not self.disabled
+        self._clicked = False
+        return clicked
 
     @property
     def disabled(self):
         return self._disabled
 
     def disable(self):
-        self._disabled = True
+        if not self._disabled:
+            self._disabled = True
+            self.dirty = True
 
     def enable(self):
-        self._disabled = False
+        if self._disabled:
+            self._disabled = False
+            self.dirty = True
 
 
 class TextBox(BasePoolObject):
+    events = frozenset((pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN))
+    events_anywhere = frozenset((pygame.MOUSEBUTTONDOWN,))  # Clicking anywhere else deactivates it
+    ticks = True  # For the cursor blink
+
     def __init__(self, x, y, width, height, max_chars, start_text, color, text_color, start_text_color, text_default="", font="comicsans", font_size=20, fit_to_text=False):
         self.x = x
         self.y = y
@@ -119,7 +406,8 @@ class TextBox(BasePoolObject):
         self.color = color
         self.text_color = text_color
         self.start_text_color = start_text_color
-        self.font = pygame.font.SysFont(font, font_size)
+        self.font_name = font
+        self.font = get_font(font, font_size)
         self.font_size = font_size
         self.text = text_default
         self.active = False
@@ -133,45 +421,65 @@ class TextBox(BasePoolObject):
     def update(self, events):
         for event in events:
             if event.type == pygame.MOUSEBUTTONDOWN:
-                self.active = self.rect.collidepoint(event.pos)
+                active = self.rect.collidepoint(event.pos)
+                if active != self.active:
+                    self.active = active
+                    self.dirty = True
 
             elif event.type == pygame.KEYDOWN and self.active:
                 if event.key == pygame.K_BACKSPACE:
                     self.text = self.text[:-1]
+                    self.dirty = True
                 else:
                     char = event.unicode
                     if len(char) < 1 or ord(char) < 32:
                         continue
                     if len(self.text) < self.max_chars:
                         self.text += char
+                        self.dirty = True
 
         # Update blinking
         if time.time() - self._last_blink >= self._blink_interval:
             self._cursor_visible = not self._cursor_visible
             self._last_blink = time.time()
-
-    def draw(self, win):
-        if self.text or self.active:
-            font_surf = self.font.render(self.text, True, self.text_color)
+            if self.active:
+                self.dirty = True
+
+    def next_blink(self):
+        """Seconds until the cursor blinks next, or None while the box isn't active."""
+        if not self.active:
+            return None
+        return max(0.0, self._last_blink + self._blink_interval - time.time())
+
+    def state(self):
+        if not self.active:
+            return "normal"
+        return "active-cursor" if self._cursor_visible else "active"
+
+    def appearance(self):
+        return self.text, self.start_text, self.color, self.text_color, self.start_text_color, tuple(self.rect), self.fit_to_text
+
+    def render(self, state):
+        if self.text or state != "normal":
+            font_surf = render_text(self.font_name, self.font_size, self.text, self.text_color)
         else:
-            font_surf = self.font.render(self.start_text, True, self.start_text_color)
-
-        text_pos = self.rect.copy()
-        text_pos.x += 2.5
-        text_pos.y -= 2
+            font_surf = render_text(self.font_name, self.font_size, self.start_text, self.start_text_color)
 
+        text_rect = font_surf.get_rect(topleft=(self.rect.x + 3, self.rect.y - 2))
         rect = self.rect.copy()
         if self.fit_to_text:
             rect.width = font_surf.get_width() + 6
-        pygame.draw.rect(win, self.color, rect, border_radius=5)
-        win.blit(font_surf, text_pos)
+        # Blinking cursor at the end of the text
+        cursor = pygame.Rect(text_rect.right - 1, text_rect.y + 6, 3, self.font_size + 1)
 
-        if self.active and self._cursor_visible:
-            # Draw blinking cursor at the end of the text
-            cursor_x = text_pos.x + font_surf.get_width()
-            cursor_y = text_pos.y + 3
-            cursor_height = self.font_size
-            pygame.draw.line(win, self.text_color, (cursor_x, cursor_y + cursor_height), (cursor_x, cursor_y + 3), 2)
+        area = rect.union(text_rect).union(cursor)
+        surface = pygame.Surface(area.size, pygame.SRCALPHA)
+        pygame.draw.rect(surface, self.color, rect.move(-area.x, -area.y), border_radius=5)
+        surface.blit(font_surf, text_rect.move(-area.x, -area.y))
+        if state == "active-cursor":
+            x, y = text_rect.right - area.x, text_rect.y + 3 - area.y
+            pygame.draw.line(surface, self.text_color, (x, y + self.font_size), (x, y + 3), 2)
+        return surface, area.topleft
 
 
 class Alert(BasePoolObject):
@@ -197,8 +505,6 @@ class Alert(BasePoolObject):
 
         self._result = None  # This will be one from self.button_names
         self._done = False
-        self._fontS = pygame.font.SysFont(None, 24)
-        self._fontL = pygame.font.SysFont(None, 30)
         w, h = pygame.display.get_window_size()
         self._rect = pygame.Rect(0, 0, width, height)
         self._rect.center = w / 2, h / 2
@@ -230,6 +536,7 @@ class Alert(BasePoolObject):
         self.pool = ObjectPool()
         self.pool.add(self._button1)
         self.pool.add(self._button2)
+        self._dirty = True
 
     def update(self, events):
         self.pool.update(events)
@@ -241,56 +548,224 @@ class Alert(BasePoolObject):
                 self._result = self.button_names[1]
                 self._done = True
 
+    @property
+    def dirty(self):
+        return self._dirty or self.pool.dirty
+
+    @dirty.setter
+    def dirty(self, value):
+        self._dirty = value
+        if not value:
+            self.pool.dirty = False
+
     def done(self):
         return self._done
 
+    def set_message(self, message):
+        if message != self.message:
+            self.message = message
+            self.mark_dirty()
+
     @property
     def result(self):
         return self._result
 
-    def draw(self, win):
-        pygame.draw.rect(win, (127, 127, 127), self._rect, border_radius=15)
+    def appearance(self):
+        return self.title, self.message, self.icon, tuple(self._rect)
+
+    def render(self, state):
+        """The panel with the icon, title and message. The buttons are drawn on top of it."""
+        surface = pygame.Surface(self._rect.size, pygame.SRCALPHA)
+        pygame.draw.rect(surface, (127, 127, 127), surface.get_rect(), border_radius=15)
 
         if self.icon:
-            win.blit(self.icon, (self._rect.x + 10, self._rect.centery - 64))
+            surface.blit(self.icon, (10, self._rect.height // 2 - 64))
 
-        title = self._fontL.render(self.title, True, (0, 0, 0))
-        parts = []
+        # The message is shown one sentence per line
+        sentences = []
         part = ""
         for char in self.message:
             part += char
             if char in "!?.":
-                parts.append(part)
+                sentences.append(part.strip())
                 part = ""
-                continue
-        message = []
-        for part in parts:
-            message.append(self._fontS.render(part.strip(), True, (0, 0, 0)))
-        if self.icon:
-            win.blit(title, (self._rect.x + 148, self._rect.y + 40))
-            y = 0
-            for part in message:
-                win.blit(part, (self._rect.x + 148, self._rect.y + 70 + y))
-                y += 24
-        else:
-            win.blit(title, (self._rect.x + 10, self._rect.y + 40))
-            y = 0
-            for part in message:
-                win.blit(part, (self._rect.x + 10, self._rect.y + 70 + y))
-                y += 24
+        x = 148 if self.icon else 10
+        surface.blit(render_text(None, 30, self.title, (0, 0, 0)), (x, 40))
+        for i, sentence in enumerate(sentences):
+            surface.blit(render_text(None, 24, sentence, (0, 0, 0)), (x, 70 + i * 24))
+        return surface, self._rect.topleft
+
+    def blit_list(self):
+        panel = super().blit_list()
+        for obj in self.pool.objects:
+            panel += obj.blit_list()
+        return panel
+
+    def draw(self, win):
+        super().draw(win)
+        self.dirty = False
 
-        self.pool.draw(win)
 
+class LogPanel(BasePoolObject):
+    """
+    Shows the newest lines of a LogBuffer, with stderr lines in `error_color`.
+    The mouse wheel scrolls back while hovered. Scrolled all the way down, it follows new lines.
+    """
+    events = frozenset((pygame.MOUSEWHEEL,))
+    ticks = True  # Checks the buffer for new lines
 
-class DoubleOut(io.TextIOBase):
-    def __init__(self, file):
-        self.file = open(file, "w", encoding="utf-8")
-        self.stdout = sys.__stdout__
+    def __init__(self, x, y, width, height, buffer, color=(30, 30, 30), text_color=(220, 220, 220), error_color=(255, 110, 110), font="Courier", font_size=14):
+        self.rect = pygame.Rect(x, y, width, height)
+        self.buffer = buffer
+        self.color = color
+        self.text_color = text_color
+        self.error_color = error_color
+        self.font_name = font
+        self.font_size = font_size
+        self.line_height = get_font(font, font_size).get_linesize()
+        self.scroll = 0  # Lines scrolled back from the newest one
+
+    @property
+    def visible_lines(self):
+        return max(1, (self.rect.height - 10) // self.line_height)
+
+    def update(self, events):
+        for event in events:
+            if event.type == pygame.MOUSEWHEEL:
+                self.scroll += event.y * 3
+        self.scroll = max(0, min(self.scroll, len(self.buffer) - self.visible_lines))
+        if self.appearance() != self._appearance:
+            self.dirty = True
+
+    def appearance(self):
+        return self.buffer.version, self.scroll, tuple(self.rect), self.color, self.text_color, self.error_color
+
+    def render(self, state):
+        surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        rect = surface.get_rect()
+        pygame.draw.rect(surface, self.color, rect, border_radius=5)
+        lines = self.buffer.lines()
+        end = len(lines) - self.scroll
+        shown = lines[max(0, end - self.visible_lines):end]
+
+        surface.set_clip(rect.inflate(-10, -10))
+        y = 5
+        for timestamp, stream, line in shown:
+            color = self.error_color if stream == "stderr" else self.text_color
+            text = f"{time.strftime('%H:%M:%S', time.localtime(timestamp))} {line}"
+            surface.blit(render_text(self.font_name, self.font_size, text, color), (5, y))
+            y += self.line_height
+        surface.set_clip(None)
+
+        if len(lines) > self.visible_lines:
+            # Scrollbar, so it's clear there is more above or below
+            height = max(10, rect.height * self.visible_lines // len(lines))
+            top = rect.bottom - height - (rect.height - height) * self.scroll // max(1, len(lines) - self.visible_lines)
+            pygame.draw.rect(surface, (120, 120, 120), (rect.right - 6, top, 4, height), border_radius=2)
+        return surface, self.rect.topleft
+
+
+class AsyncLog(io.TextIOBase):
+    """
+    Stands in for sys.stdout: everything written goes to the console and to the log file `file`.
+
+    write() only appends the text to a pending list, so printing never waits for the disk or
+    the console. A writer thread takes the whole list at once, every `flush_interval` seconds or
+    as soon as `flush_bytes` have piled up. Before a batch would take the file over `max_bytes`, it is gzipped to
+    `file`.1.gz, older backups move up one number, and at most `backups` of them are kept.
+    If the writer falls more than `max_pending` characters behind, new writes are dropped and counted,
+    and a line saying how many goes into the log where they would have been.
+    """
+    def __init__(self, file, max_bytes=1024 * 1024, backups=3, flush_interval=0.5, flush_bytes=64 * 1024, max_pending=8 * 1024 * 1024):
+        self.path = file
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.max_pending = max_pending
+        self.console = sys.__stdout__
+        self.dropped = 0
+        self._reported = 0  # Drops already noted in the log
+        self._pending = []
+        self._pending_size = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closing = False
+        self._file = open(file, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._write_batches, name="log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def writable(self):
+        return True
 
     def write(self, s):
-        self.file.write(s)
-        self.stdout.write(s)
+        with self._lock:
+            if self._pending_size + len(s) > self.max_pending:
+                self.dropped += 1
+                return len(s)
+            self._pending.append(s)
+            self._pending_size += len(s)
+            full = self._pending_size >= self.flush_bytes
+        if full:
+            self._wake.set()
+        return len(s)
 
     def flush(self):
-        self.file.flush()
-        self.stdout.flush()
\ No newline at end of file
+        pass  # The writer thread flushes on its own schedule
+
+    def _write_batches(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._pending_size = 0
+                closing = self._closing
+                dropped, self._reported = self.dropped - self._reported, self.dropped
+            if dropped:
+                # Writes are only dropped while the pending list is full, so they came after this batch
+                batch.append(f"[WARN] Log writer fell behind, dropped {dropped} writes\n")
+            if batch:
+                self._write("".join(batch))
+            if closing:
+                return
+
+    def _write(self, text):
+        if self.console is not None:
+            try:
+                self.console.write(text)
+                self.console.flush()
+            except (OSError, ValueError):
+                pass
+        try:
+            # Rotating before the write keeps the newest lines in the file itself, even without backups
+            size = self._file.tell()
+            if size and size + len(text) > self.max_bytes:
+                self._rotate()
+            self._file.write(text)
+            self._file.flush()
+        except OSError as e:
+            print(f"[ERROR] Failed to write log: {e}", file=sys.__stderr__)
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{i}.gz"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{i + 1}.gz")
+        if self.backups > 0:
+            with open(self.path, "rb") as src, gzip.open(f"{self.path}.1.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        self._file = open(self.path, "w", encoding="utf-8")
+
+    def close(self):
+        """Writes out everything queued so far and stops the writer thread."""
+        if self._thread.is_alive():
+            with self._lock:
+                self._closing = True
+            self._wake.set()
+            self._thread.join(timeout=5)
+        if not self._file.closed:
+            self._file.close()
+        super().close()
@@ -0,0 +1,256 @@
+import time
+
+BLACK = (0, 0, 0)
+
+# Effect classes by name, filled in by @register_effect
+EFFECTS = {}
+
+
+def register_effect(name):
+    def decorator(cls):
+        if name in EFFECTS:
+            raise ValueError(f"Effect '{name}' is already registered")
+        cls.name = name
+        EFFECTS[name] = cls
+        return cls
+    return decorator
+
+
+class Effect:
+    """
+    Base class of every screensaver effect.
+
+    init is called once with the size of the surface the effect will draw to and the launch
+    options. After that update(dt) and render(surface) are called once per frame, where dt is
+    the time since the last frame in seconds and render returns the rects it changed.
+    """
+    name = ""
+
+    def init(self, size, options):
+        pass
+
+    def update(self, dt):
+        pass
+
+    def render(self, surface):
+        return [surface.get_rect()]
+
+    def degrade(self):
+        """Makes the effect cheaper to run. Returns False if it can't go any lower."""
+        return False
+
+    def invalidate(self):
+        """Forgets what is on the surface, so the next render() draws all of it, e.g. after the window was shown again."""
+        pass
+
+    def set_density(self, rains, trail):
+        """Scales how much the effect draws, as shares of its full density, e.g. to save battery."""
+        pass
+
+    def counters(self):
+        """Numbers about the last frame worth showing in the profiler, e.g. {"blits": 120}."""
+        return {}
+
+    def close(self):
+        pass
+
+
+class EffectStats:
+    """Per-effect cost, as moving averages in milliseconds."""
+    def __init__(self, smoothing=0.1):
+        self.smoothing = smoothing
+        self.update_ms = 0.0
+        self.render_ms = 0.0
+        self.frames = 0
+        self.overruns = 0
+        self.skipped = 0
+
+    @property
+    def cost_ms(self):
+        return self.update_ms + self.render_ms
+
+    def add(self, update_ms, render_ms=None):
+        """Records one frame. render_ms is None for frames that weren't rendered."""
+        if self.frames == 0:
+            self.update_ms, self.render_ms = update_ms, render_ms or 0.0
+        else:
+            self.update_ms += (update_ms - self.update_ms) * self.smoothing
+            if render_ms is not None:
+                self.render_ms += (render_ms - self.render_ms) * self.smoothing
+        self.frames += 1
+
+    def as_dict(self):
+        return {
+            "update_ms": round(self.update_ms, 3),
+            "render_ms": round(self.render_ms, 3),
+            "frames": self.frames,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+        }
+
+
+class EffectEngine:
+    """
+    Runs a stack of effects on one frame clock and keeps each one within its time budget.
+
+    Every frame, each effect's update and render are timed. An effect whose update + render
+    goes over `budget_ms` for `overrun_frames` frames in a row is asked to degrade(). Once it
+    can't degrade any further, it only gets rendered every other frame while its average cost
+    stays over budget.
+    """
+    def __init__(self, names, size, options=None, budget_ms=40.0, overrun_frames=10):
+        unknown = [name for name in names if name not in EFFECTS]
+        if unknown:
+            raise ValueError(f"Unknown effect(s): {', '.join(unknown)}. Available: {', '.join(EFFECTS)}")
+        self.budget_ms = budget_ms
+        self.overrun_frames = overrun_frames
+        self.effects = [EFFECTS[name]() for name in names]
+        self.stats = {effect.name: EffectStats() for effect in self.effects}
+        self._overrun = {effect.name: 0 for effect in self.effects}
+        self._exhausted = set()  # Effects that can't degrade any more
+        self._frame = 0
+        self._last = None
+        # Total update and render time of the last frame, in seconds
+        self.update_time = 0.0
+        self.render_time = 0.0
+        for effect in self.effects:
+            effect.init(size, options or {})
+
+    def frame(self, surface):
+        """Updates and renders every effect onto `surface`. Returns the rects that changed."""
+        now = time.perf_counter()
+        dt = 0.0 if self._last is None else now - self._last
+        self._last = now
+        self._frame += 1
+
+        rects = []
+        self.update_time = self.render_time = 0.0
+        for effect in self.effects:
+            stats = self.stats[effect.name]
+            start = time.perf_counter()
+            effect.update(dt)
+            updated = time.perf_counter()
+            self.update_time += updated - start
+            update_ms = (updated - start) * 1000
+            if effect.name in self._exhausted and stats.cost_ms > self.budget_ms and self._frame % 2:
+                stats.skipped += 1
+                stats.add(update_ms)
+                continue
+            rects += effect.render(surface)
+            self.render_time += time.perf_counter() - updated
+            render_ms = (time.perf_counter() - updated) * 1000
+            stats.add(update_ms, render_ms)
+            self._check_budget(effect, update_ms + render_ms)
+
+        # Effects drawn on top of each other can't share their dirty rects
+        return rects if len(self.effects) == 1 else [surface.get_rect()]
+
+    def _check_budget(self, effect, cost_ms):
+        if cost_ms <= self.budget_ms:
+            self._overrun[effect.name] = 0
+            return
+        self.stats[effect.name].overruns += 1
+        self._overrun[effect.name] += 1
+        if self._overrun[effect.name] >= self.overrun_frames and effect.name not in self._exhausted:
+            self._overrun[effect.name] = 0
+            if effect.degrade():
+                print(f"[DEBUG] Effect '{effect.name}' over its {self.budget_ms:.0f} ms budget, degraded it")
+            else:
+                self._exhausted.add(effect.name)
+                print(f"[DEBUG] Effect '{effect.name}' over its {self.budget_ms:.0f} ms budget, skipping frames")
+
+    def set_density(self, rains, trail):
+        for effect in self.effects:
+            effect.set_density(rains, trail)
+
+    def invalidate(self):
+        for effect in self.effects:
+            effect.invalidate()
+
+    def report(self):
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    def counters(self):
+        counters = {}
+        for effect in self.effects:
+            for name, value in effect.counters().items():
+                counters[name] = counters.get(name, 0) + value
+        return counters
+
+    def close(self):
+        for effect in self.effects:
+            effect.close()
+
+
+@register_effect("blank")
+class BlankEffect(Effect):
+    """A plain black screen."""
+    def render(self, surface):
+        surface.fill(BLACK)
+        return [surface.get_rect()]
+
+
+@register_effect("matrix")
+class MatrixRainEffect(Effect):
+    """
+    The matrix rain. Options: renderer, threads, loop, font_size, fps and fixed_quality,
+    as taken by matrix.py. The rain moves one step per frame, whatever dt is.
+    """
+    def init(self, size, options):
+        # Imported here so listing the effects doesn't load NumPy
+        from governor import QualityGovernor
+        from loopcache import open_loop
+        from rain import MatrixRain
+
+        width, height = size
+        font_size = options.get("font_size", 20)
+        self.loop = options.get("loop", 0)
+        self.governor = None
+        if self.loop:
+            self.rain = open_loop(width, height, font_size=font_size, frames=self.loop)
+            print(f"[DEBUG] Playing {self.rain.frames} frame loop")
+        else:
+            renderer = options.get("renderer", "full")
+            self.rain = MatrixRain(width, height, font_size=font_size, renderer=renderer, threads=options.get("threads", 1))
+            print(f"[DEBUG] Using {renderer} renderer")
+            self.full = self.rain.max_rains, self.rain.trail_length
+            if not options.get("fixed_quality"):
+                self.governor = QualityGovernor(self.rain, options.get("fps", 20))
+        self._start = None
+
+    def update(self, dt):
+        self._start = time.perf_counter()
+        if not self.loop:
+            self.rain.step()
+
+    def render(self, surface):
+        rects = self.rain.render(surface)
+        if self.governor:
+            self.governor.frame(time.perf_counter() - self._start)
+        return rects
+
+    def counters(self):
+        if self.loop:
+            return {}
+        return {"blits": self.rain.blits, "rains": self.rain.live_rains, "cells": self.rain.trail_cells}
+
+    def degrade(self):
+        if self.governor and self.governor.level > 0:
+            self.governor.set_level(self.governor.level - 1)
+            return True
+        return False
+
+    def invalidate(self):
+        self.rain.invalidate()
+
+    def set_density(self, rains, trail):
+        if self.loop:
+            return
+        max_rains, trail_length = max(1, round(self.full[0] * rains)), max(1, round(self.full[1] * trail))
+        if self.governor:
+            self.governor.set_limits(max_rains, trail_length)
+        else:
+            self.rain.set_quality(max_rains, trail_length)
+
+    def close(self):
+        self.rain.close()
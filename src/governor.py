@@ -0,0 +1,87 @@
+# Quality levels from lowest to highest: (share of max rains, share of trail length, draw every nth column)
+QUALITY_LEVELS = [
+    (0.4, 0.4, 3),
+    (0.4, 0.5, 2),
+    (0.6, 0.6, 2),
+    (0.6, 0.6, 1),
+    (0.6, 0.8, 1),
+    (0.8, 0.8, 1),
+    (0.8, 1.0, 1),
+    (1.0, 1.0, 1),
+]
+
+
+class QualityGovernor:
+    """
+    Keeps a MatrixRain inside its frame budget by stepping its quality down and up.
+
+    Call frame() every frame with the time spent on update and render. The governor keeps a
+    moving average of that time and drops one quality level once it has been over
+    `high` of the budget for `down_frames` frames in a row. It only raises the level again
+    after `up_frames` frames under `low` of the budget, so it doesn't bounce between levels.
+    After every change it waits `settle_frames` before judging again, since rains already on
+    screen keep costing time until they fall off.
+    """
+    def __init__(self, rain, fps, high=0.85, low=0.5, down_frames=10, up_frames=60, settle_frames=40, smoothing=0.1):
+        self.rain = rain
+        self.budget = 1 / fps
+        self.high = high
+        self.low = low
+        self.down_frames = down_frames
+        self.up_frames = up_frames
+        self.settle_frames = settle_frames
+        self.smoothing = smoothing
+
+        self.max_rains = rain.max_rains
+        self.trail_length = rain.trail_length
+        self.level = len(QUALITY_LEVELS) - 1
+        self.average = None
+        self._over = 0
+        self._under = 0
+        self._settle = 0
+
+    @property
+    def load(self):
+        """Average frame work as a share of the frame budget."""
+        return 0 if self.average is None else self.average / self.budget
+
+    def frame(self, work_time):
+        """Records one frame's update + render time in seconds. Returns True if the level changed."""
+        if self.average is None:
+            self.average = work_time
+        else:
+            self.average += (work_time - self.average) * self.smoothing
+
+        if self._settle:
+            self._settle -= 1
+            return False
+
+        load = self.load
+        self._over = self._over + 1 if load > self.high else 0
+        self._under = self._under + 1 if load < self.low else 0
+
+        if self._over >= self.down_frames and self.level > 0:
+            self.set_level(self.level - 1)
+            return True
+        if self._under >= self.up_frames and self.level < len(QUALITY_LEVELS) - 1:
+            self.set_level(self.level + 1)
+            return True
+        return False
+
+    def set_limits(self, max_rains, trail_length):
+        """Changes the rains and trail length of the highest level, and applies the current level again."""
+        self.max_rains = max_rains
+        self.trail_length = trail_length
+        self.set_level(self.level)
+
+    def set_level(self, level):
+        rains, trail, column_step = QUALITY_LEVELS[level]
+        self.level = level
+        self._over = self._under = 0
+        self._settle = self.settle_frames
+        self.rain.set_quality(
+            max_rains=max(1, round(self.max_rains * rains)),
+            trail_length=max(1, round(self.trail_length * trail)),
+            column_step=column_step
+        )
+        print(f"[DEBUG] Quality level {level}/{len(QUALITY_LEVELS) - 1} at {self.load:.0%} of frame budget")
@@ -1,28 +1,19 @@
 import os
 import sys
 
-from classes import Button, ObjectPool, TextBox, DoubleOut, Alert
+from classes import Button, ObjectPool, TextBox, AsyncLog, Alert, LogPanel, render_text, text_cache
 expand = os.path.expanduser
 os.makedirs(expand("~/.screensaver"), exist_ok=True)
-sys.stdout = DoubleOut(expand("~/.screensaver/log.log"))
+sys.stdout = AsyncLog(expand("~/.screensaver/log.log"))
 
 import json
-import subprocess
 import threading
-import requests
-import io
-import zipfile
-import shutil
 from typing import Literal
 
 import pygame
-from update import UpdateChecker
-
-def abspath(path):
-    if path.startswith("/"):
-        return path
-    else:
-        return os.path.join(os.path.dirname(__file__), path)
+from update import UpdateChecker, update
+from effects import EFFECTS
+from logbuffer import LogBuffer, pump_output
 
 # --- Initialization ---
 pygame.init()
@@ -37,63 +28,37 @@ pygame.display.set_caption("ScreenSaver")
 # --- Updation ---
 updater = UpdateChecker("ProPythonCoderAya", "ScreenSaver", "update/version.json", "version.json")
 
-def update(version):
-    url = f"https://raw.githubusercontent.com/ProPythonCoderAya/ScreenSaver/main/update/versions/{version}/ScreenSaver.zip"
-    print(f"Downloading update from {url}")
-
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-    except Exception as e:
-        print(f"Failed to get update: {e}")
-        return 1
-
-    # Extract ZIP from bytes into update/
-    try:
-        with zipfile.ZipFile(io.BytesIO(response.content)) as zipf:
-            zipf.extractall(abspath("update/"))
-        print("Extracted update zip")
-    except zipfile.BadZipFile as e:
-        print(f"Bad ZIP file: {e}")
-        return 1
-
-    # Apply the update safely
-    try:
-        src_dir = "update"
-        dst_dir = os.path.abspath("../")  # This is ../
-
-        for root, dirs, files in os.walk(src_dir):
-            for file in files:
-                src_path = os.path.join(root, file)
-                rel_path = os.path.relpath(src_path, src_dir)  # Relative path from update/
-                dst_path = os.path.join(dst_dir, rel_path)  # New path in ../
-
-                os.makedirs(os.path.dirname(dst_path), exist_ok=True)
-                shutil.copy2(src_path, dst_path)
-
-        with open("version.json", "w") as f:
-            json.dump({"version": version}, f, indent=4)
-
-        shutil.rmtree(src_dir)
-
-        shutil.rmtree(abspath("C/dist/"))
-
-        os.mkdir(abspath("C/dist"))
-
-        os.system(f""" clang -dynamiclib "{abspath("C/src/main.c")}" -framework CoreAudio -o "{abspath("C/dist/libaudioutil.dylib")}" """.strip())
-        os.system(f""" cp "{abspath("C/dist/libaudioutil.dylib")}" "{abspath("libaudioutil.dylib")}" """.strip())
-
-        print("Update applied successfully!")
-    except Exception as e:
-        print(f"Failed to apply update: {e}")
-        return 1
-    return 0
-
-result = updater.check()
-if result == -1:
-    update_available, _, version = False, "", "err"
-else:
+def update_alert(result):
+    """Returns the Alert to show for an updater.check() result, or None if there is nothing to say."""
+    global version
+    if result == -1:
+        return Alert(500, 200, "Uh oh!", "Do you have internet? I need internet to check for updates.",
+                     icon="warning.svg", button_names=["", "Ok"])
     update_available, _, version = result
+    if update_available:
+        return Alert(500, 200, "Update available!", "There is an update available! Do you want to install it?", icon="icon.png", button_names=["No", "Yes"])
+    return None
+
+def update_message(done, total):
+    # Alert puts every sentence on its own line, so there are no dots in the numbers
+    if total:
+        return f"Downloading the update. {done * 100 // total}% of {total // 1024} KiB done."
+    return f"Downloading the update. {done // 1024} KiB so far."
+
+def run_update(version, sha256):
+    """Downloads and applies `version` on a background thread, posting its progress and result to the main loop."""
+    shown = None
+
+    def progress(done, total):
+        nonlocal shown
+        # One event per percent (or 256 KiB if the size is unknown), not one per chunk
+        step = done * 100 // total if total else done // (256 * 1024)
+        if step != shown:
+            shown = step
+            pygame.event.post(pygame.event.Event(UPDATE_PROGRESS_EVENT, done=done, total=total))
+
+    rc = update(version, sha256=sha256, progress=progress, rebuild_library=True)
+    pygame.event.post(pygame.event.Event(UPDATE_DONE_EVENT, rc=rc))
 
 # --- Logging ---
 def log(text: str, level: Literal[0, 1, 2] = 0):
@@ -117,17 +82,16 @@ def create_button(x, y, text, color, hover_color):
     )
 
 widget_timeout = create_textbox(200, 29, "3")
+widget_scale = create_textbox(200, 74, "1.0")
+widget_scale.max_chars = 4
+widget_effect = create_button(260, 127, "matrix", (220, 220, 220), (240, 240, 240))
 widget_save = create_button(100, 545, "Save", (0, 200, 100), (0, 230, 130))
 widget_runit = create_button(700, 545, "Run", (200, 100, 0), (230, 130, 0))
 widget_stopit = create_button(550, 545, "Stop", (200, 0, 0), (230, 50, 50))
-if update_available:
-    update_widget = Alert(500, 200, "Update available!", "There is an update available! Do you want to install it?", icon="icon.png", button_names=["No", "Yes"])
-else:
-    if version == "err":
-        update_widget = Alert(500, 200, "Uh oh!", "Do you have internet? I need internet to check for updates.",
-                              icon="warning.svg", button_names=["", "Ok"])
-    else:
-        update_widget = None
+log_buffer = LogBuffer()  # Output of main.py, shown in the log panel
+widget_log = LogPanel(25, 170, 750, 340, log_buffer)
+update_widget = None  # Set once the update check in the background has something to show
+version = None
 
 # --- Object Pool ---
 pool = ObjectPool()
@@ -138,59 +102,83 @@ widget_stopit.disable()
 
 # --- Config Load ---
 config_path = "config.json"
+warm_standby = False  # Keeps a renderer started and hidden, so the screensaver shows up right away
 if os.path.exists(config_path):
     try:
         with open(config_path, "r") as f:
             data = json.load(f)
             widget_timeout.text = str(data.get("timeout", 180) // 60)
+            widget_scale.text = str(data.get("render_scale", 1.0))
+            warm_standby = data.get("warm_standby", False)
+            if data.get("effect") in EFFECTS:
+                widget_effect.change_text(data["effect"])
     except Exception as e:
         log(f"Failed to load config: {e}", level=1)
 
 # --- Globals ---
-font = pygame.font.SysFont("comicsans", 24)
 active = True
 run = True
 process = None
 loop_thread = None
 clock = pygame.time.Clock()
+NOTIFY_EVENT = pygame.event.custom_type()  # Posted by background threads to wake the main loop
+UPDATE_EVENT = pygame.event.custom_type()  # Carries the updater.check() result as event.result
+UPDATE_PROGRESS_EVENT = pygame.event.custom_type()  # Bytes downloaded so far as event.done, of event.total
+UPDATE_DONE_EVENT = pygame.event.custom_type()  # The update's exit code as event.rc
 stop_requested = False
 is_running = False
 
+def parse_scale(text):
+    """Returns the render scale in `text`, or None if it isn't a number in (0, 1]."""
+    try:
+        scale = float(text)
+    except ValueError:
+        return None
+    return scale if 0 < scale <= 1 else None
+
 # --- Launch Logic ---
-def launch_loop(timeout_val):
+def forward_output():
+    """Writes main.py's lines that came in since the last call to our stdout and stderr, one write per stream."""
+    pending = log_buffer.take_pending()
+    for stream, out in (("stdout", sys.stdout), ("stderr", sys.stderr)):
+        lines = [line for _, name, line in pending if name == stream]
+        if lines:
+            out.write("\n".join(lines) + "\n")
+            out.flush()
+    if pending:
+        pygame.event.post(pygame.event.Event(NOTIFY_EVENT))
+
+
+def launch_loop(timeout_val, batch_interval=0.5):
+    import subprocess
     global process, stop_requested, is_running
     is_running = True
     try:
         while not stop_requested:
             log("Launching main.py")
             try:
-                process = subprocess.Popen(
-                    [sys.executable, "main.py", timeout_val],
+                # The Stop button clears the global, so this loop keeps its own reference
+                process = child = subprocess.Popen(
+                    [sys.executable, "main.py", timeout_val, *(["--standby"] if warm_standby else [])],
                     stdout=subprocess.PIPE, stderr=subprocess.PIPE,
                     text=True, bufsize=1, universal_newlines=True
                 )
+                readers = pump_output(child, log_buffer)
 
+                # The readers fill log_buffer, this thread just forwards it every batch_interval
                 while True:
-                    if stop_requested:
-                        process.terminate()
-                        break
-
-                    stdout_line = process.stdout.readline()
-                    if stdout_line:
-                        print(stdout_line.strip())
-
-                    stderr_line = process.stderr.readline()
-                    if stderr_line:
-                        print(stderr_line.strip(), file=sys.stderr)
-
-                    if stdout_line == '' and stderr_line == '' and process.poll() is not None:
+                    if stop_requested and child.poll() is None:
+                        child.terminate()
+                    try:
+                        exit_code = child.wait(timeout=batch_interval)
                         break
-
-                exit_code = process.wait()
+                    except subprocess.TimeoutExpired:
+                        forward_output()
+                for reader in readers:
+                    reader.join()
+                forward_output()
 
                 if exit_code != 0:
-                    print(process.stderr)
-                    print(process.stdout)
                     log("main.py exited with error, stopping loop.", level=3)
                     return 1
 
@@ -207,17 +195,34 @@ def launch_loop(timeout_val):
         widget_runit.change_text("Run")
         widget_stopit.disable()
         stop_requested = False
+        pygame.event.post(pygame.event.Event(NOTIFY_EVENT))
+
+if os.environ.get("SCREENSAVER_STARTUP_CHECK"):
+    # importtime.py measures the start-up up to here
+    pygame.quit()
+    sys.exit(0)
+
+# The window is up before the network is touched, and the Alert shows up whenever the result does
+updater.check_async(lambda result: pygame.event.post(pygame.event.Event(UPDATE_EVENT, result=result)))
 
 # --- Main Loop ---
+# Nothing here animates on its own, so the loop sleeps in event.wait until there is input,
+# the cursor needs to blink or a background thread posts NOTIFY_EVENT, and only draws when
+# a widget changed.
+redraw = True
 while run:
-    events = pygame.event.get()
+    blinks = [delay for delay in (widget_timeout.next_blink(), widget_scale.next_blink()) if delay is not None]
+    event = pygame.event.wait(round(min(blinks) * 1000) + 1 if blinks else 0)
+    events = [event, *pygame.event.get()] if event.type != pygame.NOEVENT else []
     if update_widget:
         if update_widget.done():
             pool.update(events)
             result = update_widget.result
             update_widget = None
+            redraw = True
             if result == "Yes":
-                update(version)
+                update_widget = Alert(500, 200, "Updating", "Downloading the update.", icon="icon.png", button_names=["", ""])
+                threading.Thread(target=run_update, args=(version, updater.digest()), name="update", daemon=True).start()
         else:
             update_widget.update(events)
     else:
@@ -229,21 +234,32 @@ while run:
                 run = False
             else:
                 pygame.display.iconify()
+        elif event.type in (pygame.WINDOWEXPOSED, pygame.WINDOWSHOWN, pygame.WINDOWRESTORED):
+            redraw = True
+        elif event.type == UPDATE_EVENT:
+            update_widget = update_alert(event.result)
+        elif event.type == UPDATE_PROGRESS_EVENT and update_widget:
+            update_widget.set_message(update_message(event.done, event.total))
+        elif event.type == UPDATE_DONE_EVENT:
+            if event.rc == 0:
+                update_widget = Alert(500, 200, "Updated!", "The update is installed. Restart ScreenSaver to use it.",
+                                      icon="icon.png", button_names=["", "Ok"])
+            else:
+                update_widget = Alert(500, 200, "Uh oh!", "The update failed. Check the log for why.",
+                                      icon="warning.svg", button_names=["", "Ok"])
 
     active = pygame.display.get_active()
 
     if active:
-        WIN.fill("#666666")
-        pool.draw(WIN)
-        if update_widget:
-            update_widget.draw(WIN)
-
         time = widget_timeout.text
+        scale = parse_scale(widget_scale.text)
 
-        color = (0, 0, 0) if time.isnumeric() else (255, 0, 0)
-        WIN.blit(font.render("Timeout (min):", True, color), (25, 25))
+        # Each click moves on to the next effect
+        if widget_effect.is_clicked():
+            names = list(EFFECTS)
+            widget_effect.change_text(names[(names.index(widget_effect.text) + 1) % len(names)])
 
-        is_valid_input = time.isnumeric()
+        is_valid_input = time.isnumeric() and scale is not None
 
         if not is_valid_input:
             widget_save.disable()
@@ -256,8 +272,19 @@ while run:
                 widget_runit.disable()
 
         if widget_save.is_clicked() and is_valid_input:
+            config = {}
+            if os.path.exists(config_path):
+                try:
+                    with open(config_path, "r") as f:
+                        config = json.load(f)
+                except Exception as e:
+                    log(f"Failed to load config: {e}", level=1)
+            config.update({"timeout": int(time) * 60, "render_scale": scale, "effect": widget_effect.text})
+            # Writes the power thresholds out too, so they can be found and edited next to the rest
+            from power import with_defaults
+            config["power"] = with_defaults(config.get("power"))
             with open(config_path, "w") as f:
-                json.dump({"timeout": int(time) * 60}, f, indent=4)
+                json.dump(config, f, indent=4)
             log("Saved configuration")
 
         if widget_runit.is_clicked() and is_valid_input and (loop_thread is None or not loop_thread.is_alive()):
@@ -269,6 +296,7 @@ while run:
             loop_thread.start()
 
         if widget_stopit.is_clicked() and process:
+            import subprocess
             log("Stop button clicked")
             stop_requested = True
             process.terminate()
@@ -280,12 +308,27 @@ while run:
             log("Process killed")
             process = None
 
-        pygame.display.flip()
-        clock.tick(60)
+        if redraw or pool.dirty or (update_widget and update_widget.dirty):
+            WIN.fill("#666666")
+            pool.draw(WIN)
+            if update_widget:
+                update_widget.draw(WIN)
+
+            color = (0, 0, 0) if time.isnumeric() else (255, 0, 0)
+            WIN.blit(render_text("comicsans", 24, "Timeout (min):", color), (25, 25))
+            color = (0, 0, 0) if scale is not None else (255, 0, 0)
+            WIN.blit(render_text("comicsans", 24, "Render scale:", color), (25, 70))
+            WIN.blit(render_text("comicsans", 24, "Effect:", (0, 0, 0)), (25, 115))
+
+            pygame.display.flip()
+            redraw = False
+            clock.tick(60)  # At most 60 redraws a second while the mouse moves over buttons
 
+log(f"Text cache: {text_cache.stats()}", level=2)
 pygame.quit()
 
 if process:
+    import subprocess
     stop_requested = True
     process.terminate()
     try:
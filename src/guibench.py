@@ -0,0 +1,111 @@
+"""
+Micro-benchmark of drawing the settings GUI's widgets, with and without their pre-rendered surfaces.
+
+Builds the same widgets as gui.py under SDL's dummy video driver and draws them through an
+ObjectPool. "immediate" drops every widget's surfaces before each frame, so everything is
+rendered again like before they were kept, "retained" only blits. Prints JSON:
+
+    python guibench.py --frames 1000
+"""
+import os
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import time
+import tracemalloc
+
+import numpy as np
+import pygame
+
+from classes import Alert, BasePoolObject, Button, LogPanel, ObjectPool, TextBox, text_cache
+from logbuffer import LogBuffer
+
+MODES = ("immediate", "retained")
+
+
+def build_widgets(log_lines):
+    """The widgets of gui.py, with `log_lines` lines in the log panel and the update Alert up."""
+    def textbox(x, y, text):
+        return TextBox(x=x, y=y, width=60, height=30, max_chars=3, start_text=text, text_default=text,
+                       color=(220, 220, 220), text_color=(0, 0, 0), start_text_color=(120, 120, 120),
+                       font="comicsans", font_size=22, fit_to_text=True)
+
+    def button(x, y, text, color, hover_color):
+        return Button(x=x, y=y, width=120, height=40, color=color, hover_color=hover_color, text_color=(0, 0, 0),
+                      text=text, font_size=22)
+
+    buffer = LogBuffer()
+    for i in range(log_lines):
+        buffer.add("stderr" if i % 10 == 0 else "stdout", f"[DEBUG] Log line {i}")
+    timeout = textbox(200, 29, "3")
+    timeout.active = True  # So the cursor state is part of it
+    widgets = [
+        timeout,
+        textbox(200, 74, "1.0"),
+        button(260, 127, "matrix", (220, 220, 220), (240, 240, 240)),
+        button(100, 545, "Save", (0, 200, 100), (0, 230, 130)),
+        button(700, 545, "Run", (200, 100, 0), (230, 130, 0)),
+        button(550, 545, "Stop", (200, 0, 0), (230, 50, 50)),
+        LogPanel(25, 170, 750, 340, buffer),
+        Alert(500, 200, "Update available!", "There is an update available! Do you want to install it?",
+              icon="icon.png", button_names=["No", "Yes"]),
+    ]
+    widgets[5].disable()
+    return widgets
+
+
+def run(mode, frames, log_lines):
+    win = pygame.display.set_mode((800, 600))
+    pool = ObjectPool()
+    widgets = build_widgets(log_lines)
+    for widget in widgets:
+        pool.add(widget)
+
+    times = []
+    renders_before = BasePoolObject.renders
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    for _ in range(frames):
+        start = time.perf_counter()
+        if mode == "immediate":
+            for widget in widgets:
+                widget.invalidate()
+                if isinstance(widget, Alert):
+                    for button in widget.pool.objects:
+                        button.invalidate()
+        win.fill("#666666")
+        pool.draw(win)
+        times.append(time.perf_counter() - start)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times = np.array(times) * 1000
+    return {
+        "mode": mode,
+        "frames": frames,
+        "mean_ms": round(float(times.mean()), 3),
+        "p95_ms": round(float(np.percentile(times, 95)), 3),
+        "renders_per_frame": round((BasePoolObject.renders - renders_before) / frames, 2),
+        "python_alloc_peak_kib": round((peak - start_memory) / 1024, 1),
+        "text_cache": text_cache.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame time of the settings GUI's widgets")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--log-lines", type=int, default=200, help="Lines in the log panel")
+    args = parser.parse_args()
+
+    pygame.init()
+    results = [run(mode, args.frames, args.log_lines) for mode in args.modes]
+    pygame.quit()
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Cold-start profile of the entry points, based on `python -X importtime`.
+
+Starts every entry point in a fresh interpreter with SCREENSAVER_STARTUP_CHECK set, which makes
+it exit once it is set up, right before its main loop. Prints the slowest imports of each,
+and exits with 1 if the median start-up time of any entry point is over its budget:
+
+    python importtime.py
+    python importtime.py --entries gui --runs 5 --top 30
+    python importtime.py --budget gui=600 main=300
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+STARTUP_CHECK_ENV = "SCREENSAVER_STARTUP_CHECK"
+
+# Script and start-up budget in milliseconds, interpreter start-up included. The budgets leave
+# room for slower machines: gui.py starts in about 450 ms, and main.py in 140 to 240 ms, most of
+# it interpreter start-up and asyncio, which the daemon can't run without.
+ENTRY_POINTS = {
+    "gui": ("gui.py", 1000),
+    "main": ("main.py", 400),
+}
+
+
+def parse_importtime(stderr):
+    """Returns {module: (self_us, cumulative_us)} from `-X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(self_us), int(cumulative_us)
+    return modules
+
+
+def top_level(stderr):
+    """Names of the modules imported directly by the script, not by another import."""
+    names = []
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "[us]" not in line:
+            name = line.split("|")[2]
+            if not name.startswith("  "):
+                names.append(name.strip())
+    return names
+
+
+def run_entry(script, home):
+    env = {
+        **os.environ,
+        STARTUP_CHECK_ENV: "1",
+        "HOME": home,  # Keeps the real log and caches out of it
+        "SDL_VIDEODRIVER": os.environ.get("SDL_VIDEODRIVER", "dummy"),
+        "PYGAME_HIDE_SUPPORT_PROMPT": "1",
+    }
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=env, capture_output=True, text=True, timeout=60)
+    elapsed = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"{script} exited with {result.returncode}:\n{result.stderr[-2000:]}")
+    return elapsed, result.stderr
+
+
+def profile(name, runs, top):
+    script, budget = ENTRY_POINTS[name]
+    with tempfile.TemporaryDirectory() as home:
+        results = [run_entry(script, home) for _ in range(runs)]
+    times = [elapsed for elapsed, _ in results]
+    modules = parse_importtime(results[-1][1])
+    slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)
+    return {
+        "script": script,
+        "startup_ms": round(statistics.median(times), 1),
+        "runs_ms": [round(t, 1) for t in times],
+        "imports_ms": round(sum(modules[m][1] for m in top_level(results[-1][1]) if m in modules) / 1000, 1),
+        "modules": len(modules),
+        "top_level_ms": {
+            m: round(modules[m][1] / 1000, 1) for m in top_level(results[-1][1]) if m in modules
+        },
+        "slowest": [
+            {"module": m, "self_ms": round(self_us / 1000, 1), "cumulative_ms": round(cumulative_us / 1000, 1)}
+            for m, (self_us, cumulative_us) in slowest[:top]
+        ],
+        "budget_ms": budget,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and cold-start profile of the entry points")
+    parser.add_argument("--entries", nargs="+", choices=ENTRY_POINTS, default=list(ENTRY_POINTS))
+    parser.add_argument("--runs", type=int, default=3, help="Start-ups per entry point, the median is checked")
+    parser.add_argument("--top", type=int, default=15, help="How many of the slowest imports to list")
+    parser.add_argument("--budget", nargs="+", default=[], metavar="ENTRY=MS", help="Override a start-up budget")
+    parser.add_argument("-o", "--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    for override in args.budget:
+        name, _, ms = override.partition("=")
+        if name not in ENTRY_POINTS or not ms.replace(".", "", 1).isdigit():
+            parser.error(f"Expected ENTRY=MS with ENTRY one of {', '.join(ENTRY_POINTS)}, got '{override}'")
+        ENTRY_POINTS[name] = ENTRY_POINTS[name][0], float(ms)
+
+    report = {name: profile(name, args.runs, args.top) for name in args.entries}
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+    over = [name for name, entry in report.items() if entry["startup_ms"] > entry["budget_ms"]]
+    for name in over:
+        entry = report[name]
+        print(f"[ERROR] {entry['script']} took {entry['startup_ms']} ms to start, over its {entry['budget_ms']} ms budget", file=sys.stderr)
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
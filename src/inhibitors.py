@@ -0,0 +1,168 @@
+"""
+Things that keep the screensaver from starting, like audio playing or a fullscreen app.
+
+Each inhibitor is a Probe registered by name. check() returns a reason string while it wants
+the screensaver held off, or None. Probes can be slow (reading /proc, running xprop), so
+Inhibitors caches each probe's answer for that probe's `ttl` seconds.
+"""
+import ctypes
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+# Probe classes by name, filled in by @register_probe
+PROBES = {}
+
+LIBRARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "libaudioutil.dylib")
+
+
+def register_probe(name):
+    def decorator(cls):
+        if name in PROBES:
+            raise ValueError(f"Probe '{name}' is already registered")
+        cls.name = name
+        PROBES[name] = cls
+        return cls
+    return decorator
+
+
+class Probe:
+    """
+    Base class of every inhibitor probe.
+
+    `root` is prepended to every file the probe reads, so it can be pointed at a fake
+    /proc tree. `options` are the inhibitor settings from config.json.
+    """
+    name = ""
+    ttl = 2.0  # Seconds a result stays valid
+
+    def __init__(self, root="/", options=None):
+        self.root = root
+        self.options = options or {}
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def available(self):
+        """Whether the probe can run on this system at all."""
+        return True
+
+    def check(self):
+        """Returns why the screensaver should be held off, or None."""
+        return None
+
+
+@register_probe("audio-linux")
+class LinuxAudioProbe(Probe):
+    """Audio is playing if any ALSA playback substream is RUNNING."""
+    def available(self):
+        return sys.platform.startswith("linux") and os.path.isdir(self.path("proc", "asound"))
+
+    def check(self):
+        for status in glob.glob(self.path("proc", "asound", "card*", "pcm*p", "sub*", "status")):
+            try:
+                with open(status, "r") as f:
+                    if "state: RUNNING" in f.read():
+                        card = os.path.relpath(status, self.path("proc", "asound")).split(os.sep)[0]
+                        return f"audio playing on {card}"
+            except OSError:
+                continue  # The stream closed while we were looking
+        return None
+
+
+@register_probe("audio-macos")
+class MacAudioProbe(Probe):
+    """Asks CoreAudio through libaudioutil.dylib (src/C/src/main.c) whether the output device is running."""
+    def __init__(self, root="/", options=None):
+        super().__init__(root, options)
+        self._lib = None
+
+    def available(self):
+        return sys.platform == "darwin" and os.path.exists(LIBRARY_PATH)
+
+    def check(self):
+        if self._lib is None:
+            # Loaded on first use, so importing this module works everywhere
+            self._lib = ctypes.CDLL(LIBRARY_PATH)
+            self._lib.is_audio_playing.restype = ctypes.c_int
+        return "audio playing" if self._lib.is_audio_playing() else None
+
+
+@register_probe("fullscreen")
+class FullscreenProbe(Probe):
+    """Asks the X11 window manager whether the active window is fullscreen, e.g. a video or a game."""
+    ttl = 5.0
+
+    def available(self):
+        return bool(os.environ.get("DISPLAY")) and shutil.which("xprop") is not None
+
+    def check(self):
+        try:
+            active = subprocess.run(["xprop", "-root", "_NET_ACTIVE_WINDOW"], capture_output=True, text=True, timeout=2)
+            window = active.stdout.split()[-1] if active.stdout.split() else ""
+            if not window.startswith("0x") or int(window, 16) == 0:
+                return None
+            state = subprocess.run(["xprop", "-id", window, "_NET_WM_STATE"], capture_output=True, text=True, timeout=2)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"[ERROR] Fullscreen probe failed: {e}")
+            return None
+        return "fullscreen window" if "_NET_WM_STATE_FULLSCREEN" in state.stdout else None
+
+
+@register_probe("command")
+class CommandProbe(Probe):
+    """Runs the shell command in the "command" option, and holds the screensaver off while it exits with 0."""
+    ttl = 10.0
+
+    def available(self):
+        return bool(self.options.get("command"))
+
+    def check(self):
+        command = self.options["command"]
+        try:
+            result = subprocess.run(command, shell=True, capture_output=True, timeout=self.options.get("command_timeout", 5))
+        except subprocess.TimeoutExpired:
+            print(f"[ERROR] Inhibit command timed out: {command}")
+            return None
+        return f"'{command}' exited with 0" if result.returncode == 0 else None
+
+
+class Inhibitors:
+    """
+    Runs a set of probes and caches every answer for that probe's ttl.
+
+    `names` defaults to every registered probe that is available on this system. `options`
+    is the "inhibitors" section of config.json; "ttl" in it overrides the probe ttls by name,
+    e.g. {"ttl": {"fullscreen": 2}}.
+    """
+    def __init__(self, names=None, root="/", options=None):
+        options = options or {}
+        root = options.get("root", root)
+        unknown = [name for name in names or [] if name not in PROBES]
+        if unknown:
+            raise ValueError(f"Unknown probe(s): {', '.join(unknown)}. Available: {', '.join(PROBES)}")
+        probes = [PROBES[name](root, options) for name in (names if names is not None else PROBES)]
+        self.probes = [probe for probe in probes if probe.available()]
+        for probe in self.probes:
+            probe.ttl = options.get("ttl", {}).get(probe.name, probe.ttl)
+        self._cache = {}  # Probe name -> (checked at, reason)
+        print(f"[DEBUG] Inhibitor probes: {', '.join(probe.name for probe in self.probes) or 'none'}")
+
+    def check(self):
+        """Returns the reason of the first probe that wants the screensaver held off, or None."""
+        now = time.monotonic()
+        for probe in self.probes:
+            checked_at, reason = self._cache.get(probe.name, (None, None))
+            if checked_at is None or now - checked_at >= probe.ttl:
+                try:
+                    reason = probe.check()
+                except Exception as e:
+                    print(f"[ERROR] Probe '{probe.name}' failed: {e}")
+                    reason = None
+                self._cache[probe.name] = now, reason
+            if reason:
+                return reason
+        return None
@@ -0,0 +1,62 @@
+import threading
+import time
+from collections import deque
+
+
+class LogBuffer:
+    """
+    The last `maxlen` lines of a child process's output, as (timestamp, stream, line).
+
+    Lines older than that are dropped, so memory stays the same however long the child runs.
+    Reader threads add() lines, take_pending() hands out the ones not forwarded yet, and
+    `version` goes up with every line so a panel showing the buffer knows when to redraw.
+    """
+    def __init__(self, maxlen=2000):
+        self.maxlen = maxlen
+        self._lines = deque(maxlen=maxlen)
+        self._pending = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self.version = 0
+        self.dropped = 0  # Lines that fell out of _pending before being forwarded
+
+    def add(self, stream, line):
+        entry = (time.time(), stream, line)
+        with self._lock:
+            self._lines.append(entry)
+            if len(self._pending) == self.maxlen:
+                self.dropped += 1
+            self._pending.append(entry)
+            self.version += 1
+
+    def lines(self):
+        with self._lock:
+            return list(self._lines)
+
+    def take_pending(self):
+        with self._lock:
+            pending = list(self._pending)
+            self._pending.clear()
+        return pending
+
+    def __len__(self):
+        return len(self._lines)
+
+
+def _read(stream, name, buffer):
+    for line in iter(stream.readline, ""):
+        buffer.add(name, line.rstrip("\n"))
+    stream.close()
+
+
+def pump_output(process, buffer):
+    """
+    Starts one thread per pipe that reads `process`'s stdout and stderr into `buffer`, so
+    neither pipe can fill up while the other one is quiet. Returns the threads.
+    """
+    threads = [
+        threading.Thread(target=_read, args=(pipe, name, buffer), name=f"pump-{name}", daemon=True)
+        for name, pipe in (("stdout", process.stdout), ("stderr", process.stderr))
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
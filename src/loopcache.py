@@ -0,0 +1,191 @@
+"""
+Pre-rendered, seamlessly looping rain for machines too slow to run the simulation live.
+
+A loop is rendered once with MatrixRain and stored under ~/.screensaver/ as sparse frames:
+for every frame, the runs of non-black pixels (start, length) and their green values.
+Playback memory-maps the file and writes each frame's pixels straight into the screen,
+clearing the previous frame's pixels first, so it costs no simulation and no blits.
+
+File layout (all integers little endian):
+    MAGIC, uint32 header length, JSON header,
+    uint64[frames, 3] frame table of (offset, runs, pixels),
+    per frame: uint32[runs] starts, uint32[runs] lengths, uint8[pixels] values
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+import pygame
+
+from rain import MatrixRain, CHARS, BLACK
+
+MAGIC = b"SSLOOP1\0"
+FORMAT_VERSION = 1
+CACHE_DIR = os.path.expanduser("~/.screensaver")
+
+
+def cache_key(width, height, font_size, frames, overlap, chars=CHARS):
+    settings = [FORMAT_VERSION, width, height, font_size, frames, overlap, chars]
+    return hashlib.sha1(json.dumps(settings).encode()).hexdigest()[:16]
+
+
+def cache_path(key):
+    return os.path.join(CACHE_DIR, f"loop-{key}.bin")
+
+
+def encode_frame(green):
+    """Encodes a (width, height) green channel as runs of non-zero pixels in row-major order."""
+    flat = green.T.ravel()
+    edges = np.diff(np.concatenate(([0], (flat != 0).view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    lengths = np.flatnonzero(edges == -1) - starts
+    return starts.astype("<u4"), lengths.astype("<u4"), flat[flat != 0]
+
+
+def run_indices(starts, lengths):
+    """Expands runs into the flat index of every pixel in them."""
+    lengths = lengths.astype(np.int64)
+    before = np.cumsum(lengths) - lengths
+    return np.repeat(starts.astype(np.int64) - before, lengths) + np.arange(int(lengths.sum()))
+
+
+def decode_frame(starts, lengths, values, width, height):
+    flat = np.zeros(width * height, dtype=np.uint8)
+    flat[run_indices(starts, lengths)] = values
+    return flat.reshape(height, width).T
+
+
+def build_loop(path, width, height, font_size, frames, overlap, warmup=None):
+    """
+    Renders `frames` + `overlap` frames of rain and writes a seamless loop of `frames` to `path`.
+
+    The first `overlap` frames are cross-faded with the `overlap` frames rendered after the
+    end, so the last frame runs into the first one without a jump.
+    """
+    start = time.perf_counter()
+    surface = pygame.Surface((width, height))
+    rain = MatrixRain(width, height, font_size=font_size)
+    # Let the screen fill up first, so the loop doesn't start from an empty sky
+    if warmup is None:
+        warmup = height // font_size + rain.trail_length
+    for _ in range(warmup):
+        rain.step()
+
+    header = json.dumps({
+        "version": FORMAT_VERSION, "width": width, "height": height, "font_size": font_size,
+        "frames": frames, "overlap": overlap, "chars": CHARS,
+    }).encode()
+    table = np.zeros((frames, 3), dtype="<u8")
+    head = []  # Encoded frames 0..overlap-1, blended with the frames after the end
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        table_offset = f.tell()
+        f.write(table.tobytes())
+
+        def write(index, encoded):
+            starts, lengths, values = encoded
+            table[index] = f.tell(), len(starts), len(values)
+            f.write(starts.tobytes() + lengths.tobytes() + values.tobytes())
+            f.write(b"\0" * (-f.tell() % 4))  # Keep the next frame's uint32 runs aligned
+
+        for index in range(frames + overlap):
+            rain.step()
+            rain.render(surface)
+            encoded = encode_frame(pygame.surfarray.pixels3d(surface)[:, :, 1])
+            if index < overlap:
+                head.append(encoded)
+            elif index < frames:
+                write(index, encoded)
+            else:
+                i = index - frames
+                weight = (i + 1) / (overlap + 1)
+                early = decode_frame(*head[i], width, height)
+                late = decode_frame(*encoded, width, height)
+                blended = (early * weight + late * (1 - weight)).round().astype(np.uint8)
+                write(i, encode_frame(blended))
+
+        f.seek(table_offset)
+        f.write(table.tobytes())
+    os.replace(tmp_path, path)
+
+    size = os.path.getsize(path) / (1024 * 1024)
+    print(f"[DEBUG] Rendered {frames} frame loop in {time.perf_counter() - start:.1f} s, {size:.1f} MiB")
+
+
+class LoopPlayer:
+    """Plays a loop file written by build_loop. Call render(surface) once per frame."""
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a loop file")
+        (header_length,) = struct.unpack_from("<I", self._map, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        self.header = json.loads(self._map[header_start:header_start + header_length])
+        self.width = self.header["width"]
+        self.height = self.header["height"]
+        self.frames = self.header["frames"]
+        self._table = np.frombuffer(self._map, dtype="<u8", count=self.frames * 3, offset=header_start + header_length).reshape(-1, 3)
+        self.index = 0
+        self._surface = None
+        self._previous = None  # (x, y) of the pixels drawn last frame
+
+    def _frame(self, index):
+        offset, runs, pixels = (int(value) for value in self._table[index])
+        starts = np.frombuffer(self._map, dtype="<u4", count=runs, offset=offset)
+        lengths = np.frombuffer(self._map, dtype="<u4", count=runs, offset=offset + runs * 4)
+        values = np.frombuffer(self._map, dtype=np.uint8, count=pixels, offset=offset + runs * 8)
+        return starts, lengths, values
+
+    def invalidate(self):
+        """Makes the next render() clear the surface and draw the whole frame."""
+        self._surface = None
+
+    def render(self, surface):
+        if surface is not self._surface:
+            surface.fill(BLACK)
+            self._surface = surface
+            self._previous = None
+
+        starts, lengths, values = self._frame(self.index)
+        y, x = np.divmod(run_indices(starts, lengths), self.width)
+        pixels = pygame.surfarray.pixels3d(surface)
+        if self._previous is not None:
+            pixels[self._previous[0], self._previous[1], 1] = 0
+        pixels[x, y, 1] = values
+        del pixels  # Unlocks the surface
+        self._previous = x, y
+        self.index = (self.index + 1) % self.frames
+        return [surface.get_rect()]
+
+    def close(self):
+        if self._map is not None:
+            self._table = None
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+def open_loop(width, height, font_size, frames, overlap=20):
+    """Returns a LoopPlayer for these settings, rendering the loop first if it isn't cached yet."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    overlap = min(overlap, frames // 2)
+    path = cache_path(cache_key(width, height, font_size, frames, overlap))
+    if os.path.exists(path):
+        try:
+            return LoopPlayer(path)
+        except Exception as e:
+            print(f"[WARN] Failed to open cached loop, rendering it again: {e}")
+
+    # Loops for other resolutions, font sizes or charsets are stale now
+    for name in os.listdir(CACHE_DIR):
+        if name.startswith("loop-") and name.endswith(".bin"):
+            os.remove(os.path.join(CACHE_DIR, name))
+    build_loop(path, width, height, font_size, frames, overlap)
+    return LoopPlayer(path)
@@ -1,25 +1,84 @@
 import sys
-import subprocess
+import abc
+import asyncio
+import signal
 import time
+import json
 from typing import Literal
-from threading import Timer
-from pynput import mouse, keyboard
-import ctypes
 import os
 
-# Load the dynamic library
-lib = ctypes.CDLL(os.path.abspath("libaudioutil.dylib"))
+from inhibitors import Inhibitors
 
-# Set return type of the function
-lib.is_audio_playing.restype = ctypes.c_int
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
 
 
-def is_system_playing_audio():
-    return bool(lib.is_audio_playing())
+def load_config():
+    if os.path.exists(CONFIG_PATH):
+        try:
+            with open(CONFIG_PATH, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"[ERROR] Failed to load config: {e}")
+    return {}
+
+
+class InputSource(abc.ABC):
+    """Calls `callback` from any thread for every mouse or keyboard input between start() and stop()."""
+    @abc.abstractmethod
+    def start(self, callback):
+        pass
+
+    def stop(self):
+        pass
+
+
+class PynputInput(InputSource):
+    """The real mouse and keyboard, through pynput's listener threads."""
+    def __init__(self):
+        self.listeners = []
+
+    def start(self, callback):
+        from pynput import mouse, keyboard
+        self.listeners = [
+            mouse.Listener(on_move=callback, on_click=callback, on_scroll=callback),
+            keyboard.Listener(on_press=callback),
+        ]
+        for listener in self.listeners:
+            listener.start()
+
+    def stop(self):
+        for listener in self.listeners:
+            listener.stop()
+        self.listeners = []
+
+
+class SyntheticInput(InputSource):
+    """Input sent by calling send(), to drive the monitor without a real mouse or keyboard."""
+    def __init__(self):
+        self.callback = None
+
+    def start(self, callback):
+        self.callback = callback
+
+    def stop(self):
+        self.callback = None
+
+    def send(self, *args):
+        if self.callback:
+            self.callback(*args)
 
 
 class InactivityMonitor:
-    def __init__(self, timeout, time_format: Literal["Seconds", "Minutes", "Hours"], file_to_open, *args_to_file):
+    """
+    Runs `file_to_open` once there has been no input for `timeout`, unless an inhibitor holds it off.
+    While inhibited it checks again after `recheck` seconds, doubling the wait each time up to `max_recheck`.
+
+    Everything is scheduled on one asyncio loop: input callbacks only record the time, the idle
+    deadline is a loop.call_at that moves itself on if there was input, and the renderer runs as
+    an asyncio subprocess whose output is streamed to ours.
+    """
+    def __init__(self, timeout, time_format: Literal["Seconds", "Minutes", "Hours"], file_to_open, *args_to_file, standby=False,
+                 inhibitors=None, recheck=5, max_recheck=60, input_source=None):
         time_map = {
             "Seconds": 1,
             "Minutes": 60,
@@ -27,55 +86,178 @@ class InactivityMonitor:
         }
         self.timeout = timeout * time_map[time_format]
         self.file_to_open = file_to_open
-        self.timer = None
-        self.active = False
+        self.last_activity = time.monotonic()
+        self.wakeups = 0  # Times the idle deadline fired, stays low however much input arrives
         self.rc = None
         self.args = args_to_file
+        self.standby = standby
+        self.renderer = None  # The warm standby renderer process, if standby is on
+        self.inhibitors = inhibitors if inhibitors is not None else Inhibitors()
+        self.input = input_source if input_source is not None else PynputInput()
+        self.recheck = recheck
+        self.max_recheck = max_recheck
+        self.recheck_delay = recheck
+        self.retry_at = 0.0  # time.monotonic() of the next check after being inhibited
+        self.loop = None
+        self._deadline = None  # The pending loop.call_at handle
+        self._idle = None  # Future resolved when the idle deadline is reached
+        self._pump = None  # Task forwarding the standby renderer's output
+        self._dismissed = None  # Future resolved when the standby renderer prints "dismissed"
         print(f"[DEBUG] Made InactivityMonitor with timeout: {self.timeout} seconds")
-        self.reset_timer()
 
     def reset_timer(self):
-        if self.timer:
-            self.timer.cancel()
-        self.timer = Timer(self.timeout, self.on_inactivity)
-        self.timer.start()
-
-    def on_inactivity(self):
-        if is_system_playing_audio():
-            print("[DEBUG] System is playing audio. Skipping screensaver.")
-            print("[DEBUG] Retrying...")
-            self.reset_timer()
-            return
+        self.last_activity = time.monotonic()
+        self.retry_at = 0.0
 
-        print(f"[DEBUG] No activity for {self.timeout} seconds")
-        self.stop_listening()
-        result = subprocess.run([sys.executable, self.file_to_open, *self.args])
-        self.rc = result.returncode
-        self.active = False
+    def on_input(self, *args):
+        # Called from the listener threads for every mouse move, so it only records the time
+        self.last_activity = time.monotonic()
 
-    def stop_listening(self):
-        self.mouse_listener.stop()
-        self.keyboard_listener.stop()
+    def _schedule(self):
+        idle_at = self.last_activity + self.timeout
+        if idle_at >= self.retry_at:
+            self.recheck_delay = self.recheck  # There was input since the last check, start the backoff over
+        # asyncio's default clock is time.monotonic, so the deadline can go to call_at as it is
+        self._deadline = self.loop.call_at(max(idle_at, self.retry_at), self._on_deadline)
 
-    def on_input(self, *args):
-        self.reset_timer()
+    def _on_deadline(self):
+        self.wakeups += 1
+        if max(self.last_activity + self.timeout, self.retry_at) > self.loop.time():
+            self._schedule()  # There was input in the meantime
+        elif not self._idle.done():
+            self._idle.set_result(None)
 
-    def run(self):
-        self.active = True
-        self.mouse_listener = mouse.Listener(
-            on_move=self.on_input,
-            on_click=self.on_input,
-            on_scroll=self.on_input
+    async def wait_for_idle(self):
+        """Returns once there has been no input for `timeout` and no inhibitor holds the screensaver off."""
+        while True:
+            self._idle = self.loop.create_future()
+            self._schedule()
+            try:
+                await self._idle
+            finally:
+                self._deadline.cancel()
+            # Probes may run commands, so they get a worker thread instead of blocking the loop
+            reason = await self.loop.run_in_executor(None, self.inhibitors.check)
+            if not reason:
+                return
+            print(f"[DEBUG] Inhibited ({reason}). Skipping screensaver.")
+            print(f"[DEBUG] Retrying in {self.recheck_delay} seconds...")
+            self.retry_at = time.monotonic() + self.recheck_delay
+            self.recheck_delay = min(self.recheck_delay * 2, self.max_recheck)
+
+    async def start_renderer(self):
+        """Starts the renderer hidden, so it has done all its setup by the time it is needed."""
+        self.renderer = await asyncio.create_subprocess_exec(
+            sys.executable, self.file_to_open, *self.args, "--standby",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE
+        )
+        self._pump = asyncio.create_task(self._pump_renderer())
+        print("[DEBUG] Started standby renderer")
+
+    async def _pump_renderer(self):
+        """Forwards the standby renderer's output as it comes, and picks out the "dismissed" lines."""
+        async for line in self.renderer.stdout:
+            line = line.decode(errors="replace").rstrip()
+            if line == "dismissed":
+                if self._dismissed and not self._dismissed.done():
+                    self._dismissed.set_result(0)
+            else:
+                print(line, flush=True)
+        # The renderer closed its output, so it died or was told to quit
+        rc = await self.renderer.wait()
+        if self._dismissed and not self._dismissed.done():
+            self._dismissed.set_result(rc)
+
+    def renderer_alive(self):
+        return self.renderer is not None and self.renderer.returncode is None and not self._pump.done()
+
+    async def show_renderer(self, shown_at):
+        """Tells the standby renderer to show itself and waits until it is dismissed."""
+        self._dismissed = self.loop.create_future()
+        try:
+            self.renderer.stdin.write(f"show {shown_at}\n".encode())
+            await self.renderer.stdin.drain()
+        except OSError as e:
+            print(f"[ERROR] Failed to reach standby renderer: {e}")
+            return 1
+        return await self._dismissed
+
+    async def run_renderer(self, shown_at):
+        """Runs the renderer once, straight to fullscreen, and waits for it to exit."""
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, self.file_to_open, *self.args, "--shown-at", str(shown_at),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
         )
-        self.keyboard_listener = keyboard.Listener(on_press=self.on_input)
+        try:
+            async for line in process.stdout:
+                print(line.decode(errors="replace").rstrip(), flush=True)
+            return await process.wait()
+        except asyncio.CancelledError:
+            process.terminate()
+            await process.wait()
+            raise
+
+    async def stop_renderer(self, timeout=5):
+        if self.renderer is None:
+            return
+        if self.renderer.returncode is None:
+            self.renderer.stdin.close()
+            try:
+                await asyncio.wait_for(self.renderer.wait(), timeout)
+            except asyncio.TimeoutError:
+                print("[ERROR] Standby renderer didn't quit, killing it")
+                self.renderer.kill()
+                await self.renderer.wait()
+        await self._pump
+        self.renderer = None
+
+    async def cycle(self):
+        """Waits for the user to go idle, shows the screensaver and returns the renderer's exit code."""
+        self.reset_timer()
+        if self.standby and not self.renderer_alive():
+            await self.start_renderer()
+        self.input.start(self.on_input)
+        try:
+            await self.wait_for_idle()
+        finally:
+            self.input.stop()
 
-        self.mouse_listener.start()
-        self.keyboard_listener.start()
+        print(f"[DEBUG] No activity for {self.timeout} seconds")
+        shown_at = time.time()
+        if self.renderer_alive():
+            return await self.show_renderer(shown_at)
+        if self.standby:
+            print("[ERROR] Standby renderer is gone, starting a new one")
+        return await self.run_renderer(shown_at)
 
-        while self.active:
-            time.sleep(0.1)  # avoids high CPU usage
+    async def serve(self):
+        """
+        Runs cycles until the screensaver ran once, or with standby on until the renderer fails.
+        SIGTERM and SIGINT cancel it cleanly, quitting the renderer on the way out.
+        """
+        self.loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        if sys.platform != "win32":
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                self.loop.add_signal_handler(sig, task.cancel)
+        try:
+            self.rc = await self.cycle()
+            # The standby renderer is already warm again after being dismissed, so keep using it
+            while self.standby and self.rc == 0:
+                print("[DEBUG] Screen Saver dismissed, back on standby")
+                self.rc = await self.cycle()
+        except asyncio.CancelledError:
+            print("[DEBUG] Monitor stopped")
+            self.rc = 0
+        finally:
+            self.input.stop()
+            await self.stop_renderer()
+        print(f"[DEBUG] Idle deadline fired {self.wakeups} times")
         return self.rc
 
+    def run(self):
+        return asyncio.run(self.serve())
+
 if __name__ == "__main__":
     print("[DEBUG] Starting monitor")
     INACTIVITY_LIMIT = 3
@@ -83,7 +265,16 @@ if __name__ == "__main__":
         if sys.argv[1].isnumeric():
             INACTIVITY_LIMIT = int(sys.argv[1])
     FILE_TO_OPEN = os.path.join(os.path.dirname(sys.argv[0]), 'matrix.py')
-    monitor = InactivityMonitor(INACTIVITY_LIMIT, "Minutes", FILE_TO_OPEN)
+    STANDBY = "--standby" in sys.argv[2:]
+    # Anything else after the timeout goes to matrix.py, e.g. --effect blank
+    ARGS = [arg for arg in sys.argv[2:] if arg != "--standby"]
+    # e.g. {"probes": ["audio-linux", "command"], "command": "pgrep -x zoom", "recheck": 5, "root": "/"}
+    INHIBIT = load_config().get("inhibitors", {})
+    inhibitors = Inhibitors(INHIBIT.get("probes"), options=INHIBIT)
+    monitor = InactivityMonitor(INACTIVITY_LIMIT, "Minutes", FILE_TO_OPEN, *ARGS, standby=STANDBY, inhibitors=inhibitors,
+                                recheck=INHIBIT.get("recheck", 5), max_recheck=INHIBIT.get("max_recheck", 60))
+    if os.environ.get("SCREENSAVER_STARTUP_CHECK"):
+        sys.exit(0)  # importtime.py measures the start-up up to here
     rc = monitor.run()
     if rc != 0:
         print(f"[ERROR] matrix.py crashed with error code: {rc}")
@@ -1,107 +1,245 @@
-import pygame
-import random
-pygame.init()
-
-info = pygame.display.Info()
-WIDTH, HEIGHT = info.current_w, info.current_h
-screen = pygame.display.set_mode((WIDTH, HEIGHT), flags=pygame.FULLSCREEN)
-pygame.display.set_caption("Screen Saver")
-pygame.mouse.set_visible(False)
-
-BLACK = (0, 0, 0)
-BRIGHT_GREEN = (0, 255, 0)
-
-font_size = 20
-font = pygame.font.SysFont('Courier', font_size)
+import argparse
+import json
+import os
+import sys
+import time
 
-chars = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789@#$%^&*()"
+import pygame
 
-cols = WIDTH // font_size
+from effects import EFFECTS, EffectEngine
+from power import PowerMonitor
+from profiler import FrameProfiler
+from rain import RENDERERS
 
-speed = 1
 fps = 20
+font_size = 20
 
-clock = pygame.time.Clock()
-running = True
-attempt = 0
-
-# Each rain is a dict: {'y': float, 'trail': list of (char, alpha)}
-rain_columns = [[] for _ in range(cols)]
-
-def create_rain(y=None):
-    if y is None:
-        y = random.uniform(-20, 0)
-    return {'y': y, 'trail': []}
-
-def can_spawn_rain(y_new, rains, min_distance=10):
-    for rain in rains:
-        if abs(rain['y'] - y_new) < min_distance:
-            return False
-    return True
-
-# Initialize columns with 1-3 rains each, spaced properly
-for i in range(cols):
-    rains = rain_columns[i]
-    attempts = 0
-    while len(rains) < random.randint(1, 3) and attempts < 10:
-        y_try = random.uniform(-20, 0)
-        if can_spawn_rain(y_try, rains):
-            rains.append(create_rain(y_try))
-        attempts += 1
-
-while running:
-    screen.fill(BLACK)
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        if event.type == pygame.MOUSEMOTION or event.type == pygame.KEYDOWN:
-            attempt += 1
-            if attempt == 2:
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+PROFILE_PATH = os.path.expanduser("~/.screensaver/profile.json")
+HUD_KEY = pygame.K_F3
+
+
+def load_config():
+    """Returns the settings saved by gui.py, or {} if there are none."""
+    if os.path.exists(CONFIG_PATH):
+        try:
+            with open(CONFIG_PATH, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"[ERROR] Failed to load config: {e}")
+    return {}
+
+
+def show(size):
+    screen = pygame.display.set_mode(size, flags=pygame.FULLSCREEN | pygame.SHOWN)
+    pygame.display.set_caption("Screen Saver")
+    pygame.mouse.set_visible(False)
+    return screen
+
+
+def hide():
+    pygame.mouse.set_visible(True)
+    pygame.display.set_mode((1, 1), flags=pygame.HIDDEN)
+
+
+def apply_power(engine, power):
+    """Switches the effects to the density of the power profile in use."""
+    if power.low_power:
+        engine.set_density(power.config["rains"], power.config["trail"])
+    else:
+        engine.set_density(1.0, 1.0)
+
+
+def play(screen, target, engine, args, power, shown_at=None):
+    """
+    Runs the screensaver on `screen` until the user moves the mouse or presses a key.
+    `target` is the surface the rain is drawn to, which is scaled up to `screen` if they differ.
+    `shown_at` is the time.time() the screensaver was asked for, to log how long it took to start.
+    F3 toggles the profiler HUD, and the profile of the run is written to PROFILE_PATH at the end.
+    On battery, `power` lowers the frame rate and density, and blanks the screen after blank_after.
+    """
+    scale = pygame.transform.smoothscale if args.smooth else pygame.transform.scale
+    clock = pygame.time.Clock()
+    profiler = FrameProfiler()
+    hud = args.hud
+    hud_rect = None
+    running = True
+    attempt = 0
+    blanked = False
+    started = time.monotonic()
+    pygame.event.clear()
+    # set_mode() hands back the same Surface every time the window is shown again, so the
+    # renderers can't tell that what they drew last time is gone
+    engine.invalidate()
+
+    while running:
+        if power.poll():
+            apply_power(engine, power)
+        frame_rate = power.fps or fps
+        if power.blank_after and time.monotonic() - started >= power.blank_after:
+            if not blanked:
+                print(f"[DEBUG] Blanking the screen after {power.blank_after} seconds on battery")
+                screen.fill((0, 0, 0))
+                pygame.display.flip()
+                blanked = True
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.MOUSEMOTION or event.type == pygame.KEYDOWN:
+                    attempt += 1
+                    if attempt == 2:
+                        running = False
+            clock.tick(frame_rate)
+            continue
+        if blanked:
+            # Back on AC, the effects draw over the black screen again
+            blanked = False
+            started = time.monotonic()
+            engine.invalidate()
+
+        profiler.begin()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
                 running = False
-
-    for i in range(cols):
-        rains = rain_columns[i]
-
-        for rain in rains[:]:  # iterate over a copy to remove safely
-            rain['y'] += speed
-
-            # Occasionally add new chars to trail
-            if len(rain['trail']) == 0 or random.random() < 0.5:
-                rain['trail'].insert(0, (random.choice(chars), 255))
-
-            # Limit trail length
-            if len(rain['trail']) > 20:
-                rain['trail'].pop()
-
-            # Draw trail
-            for j, (char, alpha) in enumerate(rain['trail']):
-                x = i * font_size
-                y = int((rain['y'] - j) * font_size)
-
-                if 0 <= y < HEIGHT:
-                    text_surface = font.render(char, True, BRIGHT_GREEN)
-                    text_surface.set_alpha(alpha)
-                    screen.blit(text_surface, (x, y))
-
-                    # Fade alpha for trail
-                    new_alpha = max(alpha - 15, 0)
-                    rain['trail'][j] = (char, new_alpha)
-
-            # Remove rain if off screen and faded
-            if rain['y'] * font_size > HEIGHT + len(rain['trail']) * font_size:
-                rains.remove(rain)
-
-        # Try to spawn new rains if fewer than 5, avoiding overlap
-        if len(rains) < 5 and random.random() < 0.02:
-            for _ in range(5):
-                y_try = random.uniform(-20, 0)
-                if can_spawn_rain(y_try, rains):
-                    rains.append(create_rain(y_try))
-                    break
-
-    pygame.display.flip()
-    clock.tick(fps)
-
-pygame.mouse.set_visible(True)
-pygame.quit()
+            elif event.type == pygame.KEYDOWN and event.key == HUD_KEY:
+                hud = not hud
+            elif event.type == pygame.MOUSEMOTION or event.type == pygame.KEYDOWN:
+                attempt += 1
+                if attempt == 2:
+                    running = False
+        profiler.lap("events")
+
+        rects = engine.frame(target)
+        profiler.record("simulation", engine.update_time)
+        profiler.lap("drawing")
+        profiler.count(engine.counters())
+
+        if target is not screen:
+            scale(target, screen.get_size(), screen)
+        if hud:
+            hud_rect = profiler.draw_hud(screen)
+            rects = [*rects, hud_rect]
+        elif hud_rect:
+            # Clear what the HUD left behind, the rain fills it in again as it changes
+            rects = [*rects, screen.fill((0, 0, 0), hud_rect)]
+            hud_rect = None
+        if args.renderer == "dirty" and not args.loop and target is screen:
+            pygame.display.update(rects)
+        else:
+            pygame.display.flip()
+        profiler.lap("present")
+
+        if shown_at is not None:
+            print(f"[DEBUG] First frame drawn {(time.time() - shown_at) * 1000:.0f} ms after the timeout", flush=True)
+            shown_at = None
+        clock.tick(frame_rate)
+        profiler.lap("sleep")
+        profiler.end()
+
+    try:
+        profiler.dump(PROFILE_PATH, effects=args.effect, renderer=args.renderer, size=list(screen.get_size()),
+                      target_size=list(target.get_size()), fps=power.fps or fps, low_power=power.low_power,
+                      effect_cost=engine.report())
+    except OSError as e:
+        print(f"[ERROR] Failed to write frame profile: {e}")
+
+
+def standby(size, target, engine, args, power):
+    """
+    Waits hidden for commands on stdin, one per line:
+        show [timestamp]  go fullscreen and run until dismissed, then print "dismissed" and hide again
+        quit              exit (so does closing stdin)
+    """
+    print("[DEBUG] Renderer ready on standby", flush=True)
+    for line in sys.stdin:
+        command, *rest = line.split() or [""]
+        if command == "show":
+            shown_at = float(rest[0]) if rest else time.time()
+            screen = show(size)
+            play(screen, target or screen, engine, args, power, shown_at)
+            hide()
+            print("dismissed", flush=True)
+        elif command == "quit":
+            break
+        elif command:
+            print(f"[ERROR] Unknown standby command: {command}", flush=True)
+
+
+def main():
+    config = load_config()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--effect", default=config.get("effect", "matrix"),
+                        help=f"Effect to show, or several separated by commas to draw them on top of each other. "
+                             f"Available: {', '.join(EFFECTS)}")
+    parser.add_argument("--effect-budget", type=float, default=config.get("effect_budget_ms", 1000 / fps), metavar="MS",
+                        help="Time each effect may take per frame before it gets degraded or skipped")
+    parser.add_argument("--renderer", choices=RENDERERS, default="full",
+                        help="full: clear, redraw and flip the whole screen every frame, "
+                             "dirty: only clear, redraw and update the cells that changed, "
+                             "pixels: composite the frame with NumPy and write it to the screen in one copy")
+    parser.add_argument("--fixed-quality", action="store_true",
+                        help="Always render at full quality, even when frames take longer than the frame budget")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Draw the full renderer in this many vertical strips, one worker thread each")
+    parser.add_argument("--loop", type=int, default=0, metavar="FRAMES",
+                        help="Play back a pre-rendered loop of this many frames instead of simulating live. "
+                             "The loop is rendered once and cached in ~/.screensaver/")
+    parser.add_argument("--scale", type=float, default=config.get("render_scale", 1.0),
+                        help="Render at this fraction of the screen resolution and scale the frame up to fit, e.g. 0.5")
+    parser.add_argument("--smooth", action="store_true", help="Scale the frame up with smoothscale instead of scale")
+    parser.add_argument("--standby", action="store_true",
+                        help="Start up hidden and wait for show commands on stdin instead of showing right away")
+    parser.add_argument("--hud", action="store_true", help="Start with the profiler HUD on (F3 toggles it)")
+    parser.add_argument("--shown-at", type=float, help="time.time() of the timeout that started this, for logging")
+    args = parser.parse_args()
+    if not 0 < args.scale <= 1:
+        parser.error("--scale must be greater than 0 and at most 1")
+    effects = args.effect.split(",")
+    for name in effects:
+        if name not in EFFECTS:
+            parser.error(f"Unknown effect '{name}', expected one of {', '.join(EFFECTS)}")
+
+    pygame.init()
+
+    info = pygame.display.Info()
+    WIDTH, HEIGHT = info.current_w, info.current_h
+    if args.standby:
+        hide()
+        screen = None
+    else:
+        screen = show((WIDTH, HEIGHT))
+
+    # With a render scale everything is drawn to a smaller offscreen surface first
+    if args.scale < 1:
+        target = pygame.Surface((round(WIDTH * args.scale), round(HEIGHT * args.scale))).convert()
+        print(f"[DEBUG] Rendering at {target.get_width()}x{target.get_height()} and scaling to {WIDTH}x{HEIGHT}")
+        width, height = target.get_size()
+    else:
+        target = None
+        width, height = WIDTH, HEIGHT
+    options = {
+        "font_size": max(6, round(font_size * args.scale)),
+        "fps": fps,
+        "renderer": args.renderer,
+        "threads": args.threads,
+        "loop": args.loop,
+        "fixed_quality": args.fixed_quality,
+    }
+    engine = EffectEngine(effects, (width, height), options, budget_ms=args.effect_budget)
+    power = PowerMonitor(config.get("power"))
+    if power.low_power:
+        apply_power(engine, power)
+
+    if args.standby:
+        standby((WIDTH, HEIGHT), target, engine, args, power)
+    else:
+        play(screen, target or screen, engine, args, power, args.shown_at)
+
+    print(f"[DEBUG] Effect cost: {json.dumps(engine.report())}")
+    engine.close()
+    pygame.mouse.set_visible(True)
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
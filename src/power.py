@@ -0,0 +1,127 @@
+"""
+Battery awareness for the renderer.
+
+read_power() finds out whether the machine runs on battery and how full it is, from
+/sys/class/power_supply on Linux and `pmset -g batt` on macOS. PowerMonitor re-reads it every
+`check_interval` seconds and says which profile the renderer should use.
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+
+# The "power" section of config.json, with these defaults for any key it leaves out
+DEFAULTS = {
+    "enabled": True,
+    "battery_below": 100,  # Use the low power profile on battery at or below this charge, in percent
+    "fps": 10,
+    "rains": 0.5,  # Share of the full rains and trail length the low power profile keeps
+    "trail": 0.5,
+    "blank_after": 0,  # Seconds after which to blank to black on battery, 0 never does
+    "check_interval": 30,  # Seconds between power source checks
+}
+
+
+def with_defaults(config):
+    """The "power" section `config` with DEFAULTS filled in for every key it leaves out."""
+    return {**DEFAULTS, **(config or {})}
+
+
+class PowerState:
+    def __init__(self, on_battery=False, percent=None):
+        self.on_battery = on_battery
+        self.percent = percent  # Battery charge, or None if there is no battery
+
+    def __repr__(self):
+        charge = "" if self.percent is None else f", {self.percent}%"
+        return f"{'battery' if self.on_battery else 'AC'}{charge}"
+
+
+def _read(path):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def read_linux(root="/"):
+    supplies = os.path.join(root, "sys", "class", "power_supply")
+    if not os.path.isdir(supplies):
+        return PowerState()
+    online = None
+    discharging = False
+    charges = []
+    for name in sorted(os.listdir(supplies)):
+        path = os.path.join(supplies, name)
+        kind = _read(os.path.join(path, "type"))
+        if kind in ("Mains", "USB", "USB_C"):
+            online = online or _read(os.path.join(path, "online")) == "1"
+        elif kind == "Battery" and _read(os.path.join(path, "scope")) != "Device":  # Skip mice and headsets
+            discharging = discharging or _read(os.path.join(path, "status")) == "Discharging"
+            capacity = _read(os.path.join(path, "capacity"))
+            if capacity.isdigit():
+                charges.append(int(capacity))
+    percent = min(charges) if charges else None
+    # Some machines have no mains entry, then the battery status is all there is to go on
+    on_battery = bool(charges) and (not online if online is not None else discharging)
+    return PowerState(on_battery, percent)
+
+
+def read_macos():
+    try:
+        output = subprocess.run(["pmset", "-g", "batt"], capture_output=True, text=True, timeout=2).stdout
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"[ERROR] Failed to read power source: {e}")
+        return PowerState()
+    match = re.search(r"(\d+)%", output)
+    return PowerState("'Battery Power'" in output, int(match.group(1)) if match else None)
+
+
+def read_power(root="/"):
+    if sys.platform == "darwin":
+        return read_macos()
+    if sys.platform.startswith("linux"):
+        return read_linux(root)
+    return PowerState()
+
+
+class PowerMonitor:
+    """
+    Tracks the power source during a run. `config` is the "power" section of config.json.
+    poll() re-reads the power source once `check_interval` has passed and returns True if
+    low_power changed, so the caller knows to apply the other profile.
+    """
+    def __init__(self, config=None, root="/"):
+        self.config = with_defaults(config)
+        self.root = self.config.get("root", root)
+        self.state = PowerState()
+        self.low_power = False
+        self._checked = None
+        self.poll()
+        print(f"[DEBUG] Power: {self.state}, {'low power' if self.low_power else 'full'} profile")
+
+    @property
+    def fps(self):
+        return self.config["fps"] if self.low_power else None
+
+    @property
+    def blank_after(self):
+        return self.config["blank_after"] if self.low_power else 0
+
+    def poll(self):
+        now = time.monotonic()
+        first = self._checked is None
+        if not first and now - self._checked < self.config["check_interval"]:
+            return False
+        self._checked = now
+        if not self.config["enabled"]:
+            return False
+        self.state = read_power(self.root)
+        low_power = self.state.on_battery and (self.state.percent is None or self.state.percent <= self.config["battery_below"])
+        changed = low_power != self.low_power
+        self.low_power = low_power
+        if changed and not first:
+            print(f"[DEBUG] Power: {self.state}, switching to {'low power' if low_power else 'full'} profile")
+        return changed
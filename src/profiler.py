@@ -0,0 +1,156 @@
+import bisect
+import json
+import os
+import time
+from collections import deque
+
+import pygame
+
+PHASES = ("events", "simulation", "drawing", "present", "sleep")
+
+# Upper bounds of the histogram buckets in milliseconds, the last bucket takes everything above.
+# 1 ms steps up to 100 ms, so frames around the 50 ms budget of 20 fps land in different buckets
+BUCKETS_MS = (*range(1, 101), 150, 250, 500, 1000)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.total += ms
+        self.count += 1
+        self.min = min(self.min, ms)
+        self.max = max(self.max, ms)
+
+    def percentile(self, p):
+        """
+        The p-th percentile, interpolated linearly within the bucket it falls in and kept
+        between the smallest and largest value seen, so it is off by less than a bucket.
+        """
+        if not self.count:
+            return 0.0
+        rank = self.count * p / 100
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKETS_MS[i - 1] if i else 0.0
+                upper = BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+                value = lower + (upper - lower) * (rank - seen) / count
+                return round(min(max(value, self.min), self.max), 3)
+            seen += count
+        return round(self.max, 3)
+
+    def as_dict(self):
+        labels = [f"<={bound}" for bound in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"]
+        return {
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max, 3),
+            # Only the buckets that were hit, there are over a hundred
+            "histogram_ms": {label: count for label, count in zip(labels, self.counts) if count},
+        }
+
+
+class FrameProfiler:
+    """
+    Times each phase of the screensaver loop and keeps counters such as blits per frame.
+
+    Call begin() at the start of a frame, lap(phase) at the end of each phase and end() when
+    the frame is done. record(phase, seconds) adds time measured somewhere else; a later
+    lap() doesn't count it twice. Rolling averages over the last `window` frames feed the HUD,
+    histograms over the whole run feed the JSON summary written by dump().
+    """
+    def __init__(self, window=60):
+        self.recent = {phase: deque(maxlen=window) for phase in PHASES}
+        self.recent_frames = deque(maxlen=window)
+        self.histograms = {phase: Histogram() for phase in PHASES}
+        self.frame_histogram = Histogram()
+        self.counters = {}
+        self.counter_totals = {}
+        self.counter_max = {}
+        self.frames = 0
+        self.started = time.monotonic()
+        self._frame_start = None
+        self._mark = None
+        self._recorded = 0.0
+        self._current = {}
+        self._font = None
+
+    def begin(self):
+        self._frame_start = self._mark = time.perf_counter()
+        self._recorded = 0.0
+        self._current = dict.fromkeys(PHASES, 0.0)
+
+    def record(self, phase, seconds):
+        self._current[phase] += seconds
+        self._recorded += seconds
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self._current[phase] += max(0.0, now - self._mark - self._recorded)
+        self._mark = now
+        self._recorded = 0.0
+
+    def count(self, counters):
+        self.counters = counters
+        for name, value in counters.items():
+            self.counter_totals[name] = self.counter_totals.get(name, 0) + value
+            self.counter_max[name] = max(self.counter_max.get(name, 0), value)
+
+    def end(self):
+        frame_ms = (time.perf_counter() - self._frame_start) * 1000
+        self.frames += 1
+        self.frame_histogram.add(frame_ms)
+        self.recent_frames.append(frame_ms)
+        for phase, seconds in self._current.items():
+            self.histograms[phase].add(seconds * 1000)
+            self.recent[phase].append(seconds * 1000)
+
+    def averages(self):
+        return {phase: sum(times) / len(times) if times else 0.0 for phase, times in self.recent.items()}
+
+    def draw_hud(self, surface):
+        """Draws the rolling averages in the top left corner and returns the rect it covered."""
+        if self._font is None:
+            self._font = pygame.font.SysFont("Courier", 14)
+        frame_ms = sum(self.recent_frames) / len(self.recent_frames) if self.recent_frames else 0.0
+        lines = [
+            f"{1000 / frame_ms if frame_ms else 0:5.1f} fps  {frame_ms:6.2f} ms/frame",
+            "  ".join(f"{phase} {ms:.2f}" for phase, ms in self.averages().items()),
+            "  ".join(f"{name} {value}" for name, value in self.counters.items()),
+        ]
+        texts = [self._font.render(line, True, (255, 255, 255)) for line in lines if line]
+        rect = pygame.Rect(0, 0, max(text.get_width() for text in texts) + 10, sum(text.get_height() for text in texts) + 10)
+        surface.fill((0, 0, 0), rect)
+        y = 5
+        for text in texts:
+            surface.blit(text, (5, y))
+            y += text.get_height()
+        return rect
+
+    def summary(self):
+        return {
+            "frames": self.frames,
+            "seconds": round(time.monotonic() - self.started, 1),
+            "frame": self.frame_histogram.as_dict(),
+            "phases": {phase: histogram.as_dict() for phase, histogram in self.histograms.items()},
+            "counters": {
+                name: {"mean": round(total / self.frames, 1) if self.frames else 0, "max": self.counter_max[name]}
+                for name, total in self.counter_totals.items()
+            },
+        }
+
+    def dump(self, path, **extra):
+        """Writes summary() and any `extra` keys to `path` as JSON."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({**extra, **self.summary()}, f, indent=4)
+        print(f"[DEBUG] Wrote frame profile to {path}")
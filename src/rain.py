@@ -0,0 +1,397 @@
+import time
+
+import numpy as np
+import pygame
+
+from strips import StripPool
+
+BLACK = (0, 0, 0)
+BRIGHT_GREEN = (0, 255, 0)
+
+CHARS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789@#$%^&*()"
+
+# Every alpha a trail cell can have: new chars start at 255 and fade by 15 per frame
+ALPHAS = range(255, -1, -15)
+
+MAX_RAINS = 5  # Per column
+TRAIL_LENGTH = 20
+MIN_DISTANCE = 10  # Between two rains in the same column, in rows
+
+RENDERERS = ("full", "dirty", "pixels")
+
+
+def build_atlas(font, chars, color):
+    """
+    Renders every char at every fade level once into a single surface.
+    Returns the atlas and a flat list of areas indexed by level * len(chars) + char_index,
+    where level is (255 - alpha) // 15.
+    """
+    start = time.perf_counter()
+    glyphs = [font.render(char, True, color) for char in chars]
+    cell_w = max(glyph.get_width() for glyph in glyphs)
+    cell_h = max(glyph.get_height() for glyph in glyphs)
+
+    atlas = pygame.Surface((cell_w * len(glyphs), cell_h * len(ALPHAS)), pygame.SRCALPHA)
+    areas = []
+    for row, alpha in enumerate(ALPHAS):
+        for col, glyph in enumerate(glyphs):
+            faded = glyph.copy()
+            faded.fill((255, 255, 255, alpha), special_flags=pygame.BLEND_RGBA_MULT)
+            area = pygame.Rect(col * cell_w, row * cell_h, glyph.get_width(), glyph.get_height())
+            # MAX onto the empty atlas copies the pixels as they are instead of blending them
+            atlas.blit(faded, area, special_flags=pygame.BLEND_RGBA_MAX)
+            areas.append(area)
+    if pygame.display.get_surface() is not None:
+        atlas = atlas.convert_alpha()
+
+    elapsed = (time.perf_counter() - start) * 1000
+    size = atlas.get_width() * atlas.get_height() * atlas.get_bytesize() / 1024
+    print(f"[DEBUG] Built glyph atlas: {len(glyphs)} chars x {len(ALPHAS)} levels in {elapsed:.1f} ms, {size:.0f} KiB")
+    return atlas, areas
+
+
+class MatrixRain:
+    """
+    The matrix rain simulation and its drawing, without any window or event handling.
+
+    Call step() once per frame to advance the rain, then render(surface) to draw it.
+    render returns the rects of the surface it changed.
+
+    With threads > 1 the full renderer splits the screen into that many vertical strips of
+    columns and draws each strip on its own worker thread. Call close() to stop the workers.
+    """
+    def __init__(self, width, height, font_size=20, renderer="full", max_rains=MAX_RAINS, trail_length=TRAIL_LENGTH, speed=1, seed=None, threads=1):
+        if renderer not in RENDERERS:
+            raise ValueError(f"Unknown renderer '{renderer}', expected one of {RENDERERS}")
+        if threads > 1 and renderer != "full":
+            raise ValueError(f"Only the full renderer can draw on more than one thread, not '{renderer}'")
+        self.width = width
+        self.height = height
+        self.font_size = font_size
+        self.renderer = renderer
+        self.max_rains = max_rains
+        self.trail_length = trail_length
+        self.speed = speed
+        self.column_step = 1  # Only every nth column spawns rains
+        self.chars = CHARS
+
+        self.font = pygame.font.SysFont('Courier', font_size)
+        self.atlas, self.atlas_areas = build_atlas(self.font, self.chars, BRIGHT_GREEN)
+        self.glyph_width = self.atlas.get_width() // len(self.chars)
+        self.glyph_height = self.atlas.get_height() // len(ALPHAS)
+
+        self.cols = width // font_size
+        self.rng = np.random.default_rng(seed)
+
+        # Struct-of-arrays rain state, one slot per (column, rain) and per trail cell.
+        # Trail cell 0 is the head, cell j is drawn j rows above it.
+        self.rain_y = np.zeros((self.cols, max_rains))
+        self.rain_active = np.zeros((self.cols, max_rains), dtype=bool)
+        self.trail_len = np.zeros((self.cols, max_rains), dtype=np.int64)
+        self.trail_glyph = np.zeros((self.cols, max_rains, trail_length), dtype=np.int64)
+        self.trail_alpha = np.zeros((self.cols, max_rains, trail_length), dtype=np.int64)
+        self.trail_rows = np.arange(trail_length)
+        self.col_x = np.arange(self.cols) * font_size
+
+        self.blits = 0  # Glyphs blitted by the last render()
+        # Cells to draw this frame, filled in by step()
+        self.draw_x = np.zeros(0, dtype=np.int64)
+        self.draw_y = np.zeros(0, dtype=np.int64)
+        self.draw_area = np.zeros(0, dtype=np.int64)
+        # Draws of the last frame shown by the dirty renderer, as encoded by _draw_keys
+        self._previous_keys = np.zeros(0, dtype=np.int64)
+        self._dirty_surface = None
+        # Glyph alpha masks and the frame buffer of the pixels renderer, made on first use
+        self._masks = None
+        self._pixel_buffer = None
+        self._pixel_bytes = None
+        self._pixel_surface = None
+        # Worker threads of the full renderer and the strips of the surface they draw to
+        self.threads = threads
+        self._pool = StripPool(threads) if threads > 1 else None
+        self._strip_surface = None
+        self._strips = []
+
+        # Initialize columns with 1-3 rains each, spaced properly
+        wanted = self.rng.integers(1, 4, self.cols)
+        for _ in range(10):
+            columns = np.flatnonzero(self.rain_active.sum(axis=1) < wanted)
+            if len(columns) == 0:
+                break
+            self._spawn_rains(self.rng.uniform(-20, 0, (len(columns), 1)), columns)
+
+    @property
+    def live_rains(self):
+        return int(self.rain_active.sum())
+
+    @property
+    def trail_cells(self):
+        return int(self.trail_len.sum())
+
+    def invalidate(self):
+        """Makes the next render() clear the surface and draw everything, not just what changed."""
+        self._dirty_surface = None
+        self._pixel_surface = None
+        self._strip_surface = None
+
+    def set_quality(self, max_rains, trail_length, column_step=1):
+        """
+        Changes how much rain is simulated, up to the limits the engine was created with.
+        Longer trails are cut right away, extra rains and columns are left to fall off screen.
+        """
+        _, slots, cells = self.trail_glyph.shape
+        self.max_rains = min(max_rains, slots)
+        self.trail_length = min(trail_length, cells)
+        self.column_step = column_step
+        np.minimum(self.trail_len, self.trail_length, out=self.trail_len)
+
+    def _spawn_rains(self, candidates, columns):
+        """
+        Places one new rain per column in `columns`, using the first of its candidate y values
+        that keeps MIN_DISTANCE to every live rain in that column. Columns without a valid
+        candidate or a free slot are left as they are.
+        """
+        live_y = self.rain_y[columns]
+        live = self.rain_active[columns]
+        too_close = (np.abs(live_y[:, None, :] - candidates[:, :, None]) < MIN_DISTANCE) & live[:, None, :]
+        valid = ~too_close.any(axis=2)
+        ok = valid.any(axis=1) & ~live.all(axis=1)
+        columns = columns[ok]
+        y_new = candidates[ok, valid[ok].argmax(axis=1)]
+        slot = np.argmin(self.rain_active[columns], axis=1)  # First free slot
+        self.rain_y[columns, slot] = y_new
+        self.rain_active[columns, slot] = True
+        self.trail_len[columns, slot] = 0
+
+    def step(self):
+        """Advances every rain by one frame and works out which cells to draw."""
+        rain_active = self.rain_active
+        trail_len = self.trail_len
+        self.rain_y[rain_active] += self.speed
+
+        # Occasionally add new chars to trail, shifting the rest back by one (the last one drops off)
+        push = rain_active & ((trail_len == 0) | (self.rng.random(rain_active.shape) < 0.5))
+        count = int(push.sum())
+        if count:
+            glyphs = self.trail_glyph[push]
+            alphas = self.trail_alpha[push]
+            glyphs[:, 1:] = glyphs[:, :-1]
+            alphas[:, 1:] = alphas[:, :-1]
+            glyphs[:, 0] = self.rng.integers(0, len(self.chars), count)
+            alphas[:, 0] = 255
+            self.trail_glyph[push] = glyphs
+            self.trail_alpha[push] = alphas
+            np.minimum(trail_len + push, self.trail_length, out=trail_len)
+
+        # Cells on screen get drawn, then fade
+        cell_y = ((self.rain_y[:, :, None] - self.trail_rows) * self.font_size).astype(np.int64)
+        on_screen = rain_active[:, :, None] & (self.trail_rows < trail_len[:, :, None]) & (cell_y >= 0) & (cell_y < self.height)
+        visible = on_screen & (self.trail_alpha > 0)
+        col, _, _ = np.nonzero(visible)
+        self.draw_x = self.col_x[col]
+        self.draw_y = cell_y[visible]
+        self.draw_area = (255 - self.trail_alpha[visible]) // 15 * len(self.chars) + self.trail_glyph[visible]
+        self.trail_alpha[on_screen] = np.maximum(self.trail_alpha[on_screen] - 15, 0)
+
+        # Remove rains that are off screen and faded
+        gone = rain_active & (self.rain_y * self.font_size > self.height + trail_len * self.font_size)
+        rain_active[gone] = False
+        trail_len[gone] = 0
+
+        # Try to spawn new rains in columns with fewer than max_rains, avoiding overlap
+        spawn = (rain_active.sum(axis=1) < self.max_rains) & (self.rng.random(self.cols) < 0.02)
+        if self.column_step > 1:
+            spawn[np.arange(self.cols) % self.column_step != 0] = False
+        columns = np.flatnonzero(spawn)
+        if len(columns):
+            self._spawn_rains(self.rng.uniform(-20, 0, (len(columns), 5)), columns)
+
+    def render(self, surface):
+        """Draws the current frame onto `surface` and returns the list of rects it changed."""
+        self.blits = 0
+        if self.renderer == "dirty":
+            return self._render_dirty(surface)
+        if self.renderer == "pixels":
+            return self._render_pixels(surface)
+        return self._render_full(surface)
+
+    def close(self):
+        if self._pool:
+            self._pool.close()
+            self._pool = None
+
+    def _render_full(self, surface):
+        self.blits = len(self.draw_x)
+        if self._pool:
+            return self._render_strips(surface)
+        self._draw_columns(surface, 0, 0, len(self.draw_x))
+        return [surface.get_rect()]
+
+    def _draw_columns(self, surface, offset_x, first, last):
+        """Clears `surface` and draws draws[first:last] onto it, shifted left by offset_x."""
+        surface.fill(BLACK)
+        atlas, areas = self.atlas, self.atlas_areas
+        draw_x = (self.draw_x[first:last] - offset_x).tolist()
+        surface.blits(
+            [(atlas, (x, y), areas[area]) for x, y, area in zip(draw_x, self.draw_y[first:last].tolist(), self.draw_area[first:last].tolist())],
+            doreturn=False
+        )
+
+    def _render_strips(self, surface):
+        """Draws each strip of columns into its own subsurface, one strip per worker thread."""
+        if surface is not self._strip_surface:
+            # Strip i holds columns [bounds[i], bounds[i + 1]), the last one also gets any spare pixels on the right
+            bounds = [self.cols * i // self.threads for i in range(self.threads + 1)]
+            edges = [column * self.font_size for column in bounds[:-1]] + [surface.get_width()]
+            self._strips = [
+                (surface.subsurface((left, 0, right - left, surface.get_height())), left)
+                for left, right in zip(edges, edges[1:])
+            ]
+            self._strip_surface = surface
+
+        # Draws come out of step() sorted by column, so each strip's draws are one slice
+        lefts = np.array([left for _, left in self._strips[1:]], dtype=np.int64)
+        cuts = [0, *np.searchsorted(self.draw_x, lefts).tolist(), len(self.draw_x)]
+        self._pool.run([
+            lambda strip=strip, left=left, first=first, last=last: self._draw_columns(strip, left, first, last)
+            for (strip, left), first, last in zip(self._strips, cuts, cuts[1:])
+        ])
+        return [surface.get_rect()]
+
+    def _draw_keys(self):
+        """Encodes each (column, y, area) draw as one int, so sorting orders draws by column and then y."""
+        return ((self.draw_x // self.font_size) * self.height + self.draw_y) * len(self.atlas_areas) + self.draw_area
+
+    @staticmethod
+    def _clear(surface, rects):
+        """
+        Fills `rects` with black and returns them clipped to the surface. SDL's fill costs about
+        the same per row however narrow the rect is, which adds up over a hundred column runs,
+        so they are cleared through one pixel array instead.
+        """
+        bounds = surface.get_rect()
+        rects = [rect.clip(bounds) for rect in rects]
+        if surface.get_bytesize() == 3:  # pixels2d can't map 24 bit surfaces
+            for rect in rects:
+                surface.fill(BLACK, rect)
+            return rects
+        black = surface.map_rgb(BLACK)
+        pixels = pygame.surfarray.pixels2d(surface)
+        for rect in rects:
+            pixels[rect.left:rect.right, rect.top:rect.bottom] = black
+        del pixels  # Unlocks the surface
+        return rects
+
+    def _render_dirty(self, surface):
+        """
+        Only touches the parts of the surface that differ from the last frame.
+
+        This frame's draws and last frame's removed draws are merged per column into runs of
+        overlapping or adjacent cells. Runs holding an added or removed draw are cleared and
+        get their current draws blitted again.
+        """
+        new_surface = surface is not self._dirty_surface
+        if new_surface:
+            # A new surface has none of last frame's draws on it yet
+            surface.fill(BLACK)
+            self._previous_keys = np.zeros(0, dtype=np.int64)
+            self._dirty_surface = surface
+
+        keys = self._draw_keys()
+        added = ~np.isin(keys, self._previous_keys)
+        removed = self._previous_keys[~np.isin(self._previous_keys, keys)]
+        self._previous_keys = keys
+        if not len(removed) and not added.any():
+            return [surface.get_rect()] if new_surface else []
+
+        n_areas = len(self.atlas_areas)
+        all_keys = np.concatenate((keys, removed))
+        changed = np.concatenate((added, np.ones(len(removed), dtype=bool)))
+        current = np.concatenate((np.ones(len(keys), dtype=bool), np.zeros(len(removed), dtype=bool)))
+        order = np.argsort(all_keys)
+        all_keys, changed, current = all_keys[order], changed[order], current[order]
+        area = all_keys % n_areas
+        col, y = np.divmod(all_keys // n_areas, self.height)
+
+        # A new run starts at every column change and every gap between cells. Cells of a trail are
+        # font_size apart, so that is the step within a run; taller glyphs stretch it to their height.
+        # Each run is cleared down to `row` below its last cell, which can't reach the next run.
+        row = max(self.font_size, self.glyph_height)
+        run_start = np.ones(len(all_keys), dtype=bool)
+        run_start[1:] = (col[1:] != col[:-1]) | (y[1:] > y[:-1] + row)
+        starts = np.flatnonzero(run_start)
+        ends = np.append(starts[1:], len(all_keys)) - 1
+        run_dirty = np.logical_or.reduceat(changed, starts)
+        run = np.cumsum(run_start) - 1
+
+        font_size = self.font_size
+        rects = self._clear(surface, [
+            pygame.Rect(c * font_size, top, font_size, bottom + row - top)
+            for c, top, bottom in zip(col[starts[run_dirty]].tolist(), y[starts[run_dirty]].tolist(), y[ends[run_dirty]].tolist())
+        ])
+        redraw = current & run_dirty[run]
+        self.blits = int(redraw.sum())
+        atlas, areas = self.atlas, self.atlas_areas
+        surface.blits(
+            [(atlas, (c * font_size, top), areas[a]) for c, top, a in zip(col[redraw].tolist(), y[redraw].tolist(), area[redraw].tolist())],
+            doreturn=False
+        )
+        return [surface.get_rect()] if new_surface else rects
+
+    def _render_pixels(self, surface):
+        """
+        Composites the whole frame with NumPy instead of blitting glyph by glyph.
+
+        Each draw adds its glyph's alpha mask, weighted by its trail alpha, into a buffer shaped
+        (y, column, x within column), which is the surface's own pixel order. The green channel
+        of `surface` is then written from the buffer in one copy, cropped to the surface's size.
+        Only green is written, so the surface is cleared once when it is first used. Overlapping
+        glyphs add up instead of blending, which only matters where trails cross.
+        """
+        width = min(self.glyph_width, self.font_size)
+        if self._masks is None:
+            # The first atlas row holds every char at full alpha
+            alpha = pygame.surfarray.array_alpha(self.atlas)[:, :self.glyph_height]
+            masks = alpha.reshape(len(self.chars), self.glyph_width, self.glyph_height)[:, :width]
+            self._masks = np.ascontiguousarray(masks.transpose(0, 2, 1), dtype=np.uint16)
+            # Spare rows at the bottom take the part of glyphs hanging past the last line
+            self._pixel_buffer = np.zeros((self.height + self.glyph_height, self.cols, width), dtype=np.uint16)
+            self._pixel_bytes = np.zeros((self.height, self.cols, width), dtype=np.uint8)
+            row = self.cols * width
+            self._mask_offsets = (np.arange(self.glyph_height)[:, None] * row + np.arange(width)).reshape(-1)
+        if surface is not self._pixel_surface:
+            surface.fill(BLACK)
+            self._pixel_surface = surface
+
+        buffer = self._pixel_buffer
+        buffer.fill(0)
+        level, glyph = np.divmod(self.draw_area, len(self.chars))
+        values = self._masks[glyph] * (255 - level * 15)[:, None, None].astype(np.uint16) // 255
+        values = values.reshape(len(values), -1)
+        column = self.draw_x // self.font_size
+        index = (self.draw_y * self.cols + column) * width
+        index = index[:, None] + self._mask_offsets
+        flat = buffer.reshape(-1)
+        # Glyphs only overlap where trails cross, so most draws own their cells and can be stored
+        # outright. The few that overlap are added afterwards and clamped, since they may pass 255.
+        order = np.lexsort((self.draw_y, column))
+        near = (column[order][1:] == column[order][:-1]) & (np.diff(self.draw_y[order]) < self.glyph_height)
+        shared = np.zeros(len(order), dtype=bool)
+        shared[order[1:][near]] = True
+        shared[order[:-1][near]] = True
+        flat[index[~shared]] = values[~shared]
+        if shared.any():
+            index = index[shared]
+            np.add.at(flat, index, values[shared])
+            flat[index] = np.minimum(flat[index], 255)
+
+        # Columns and rows that do not fit on the surface are left out
+        surface_width, surface_height = surface.get_size()
+        cols = min(self.cols, surface_width // self.font_size)
+        height = min(self.height, surface_height)
+        np.copyto(self._pixel_bytes, buffer[:self.height], casting="unsafe")
+        pixels = pygame.surfarray.pixels3d(surface)
+        green = pixels[:cols * self.font_size, :height, 1].reshape(cols, self.font_size, height)
+        green[:, :width] = self._pixel_bytes[:height, :cols].transpose(1, 2, 0)
+        del pixels, green  # Unlocks the surface
+        return [surface.get_rect()]
@@ -0,0 +1,57 @@
+import threading
+
+
+class StripPool:
+    """
+    A fixed set of worker threads that each run one job per frame.
+
+    run(jobs) hands jobs[i] to worker i, and returns once every worker is done, so the
+    caller can present the frame straight after. pygame's fill and blit release the GIL,
+    so strips drawn by different workers really run at the same time.
+    """
+    def __init__(self, workers):
+        self.workers = workers
+        self._jobs = [None] * workers
+        self._errors = []
+        self._closed = False
+        # Every worker and the caller meet at _start before a frame and at _done after it
+        self._start = threading.Barrier(workers + 1)
+        self._done = threading.Barrier(workers + 1)
+        self._threads = [
+            threading.Thread(target=self._work, args=(i,), name=f"strip-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _work(self, index):
+        while True:
+            self._start.wait()
+            if self._closed:
+                return
+            try:
+                self._jobs[index]()
+            except Exception as e:
+                self._errors.append(e)
+            self._done.wait()
+
+    def run(self, jobs):
+        if self._closed:
+            raise RuntimeError("StripPool is closed")
+        if len(jobs) != self.workers:
+            raise ValueError(f"Expected {self.workers} jobs, but got {len(jobs)}")
+        self._jobs = jobs
+        self._start.wait()
+        self._done.wait()
+        if self._errors:
+            error = self._errors[0]
+            self._errors.clear()
+            raise error
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._start.wait()
+        for thread in self._threads:
+            thread.join()
@@ -1,10 +1,9 @@
 import json
+import hashlib
 import re
 import shutil
-import zipfile
-import io
-
-import requests
+import threading
+import time
 import argparse
 import os
 
@@ -15,27 +14,95 @@ def abspath(path):
         return os.path.join(os.path.dirname(__file__), path)
 
 class UpdateChecker:
-    def __init__(self, gituser, gitrepo, gitrepoversionfile, localversionfile):
+    """
+    Compares the local version file with the one in the GitHub repo.
+
+    The remote file is cached in `cache_file` for `ttl` seconds, so most checks make no request.
+    After that it is fetched again with If-None-Match / If-Modified-Since, and a 304 just
+    makes the cached copy fresh again. If that fetch fails, the expired copy is used and the
+    next check tries again. No request waits longer than `timeout` seconds.
+    """
+    def __init__(self, gituser, gitrepo, gitrepoversionfile, localversionfile,
+                 cache_file=os.path.expanduser("~/.screensaver/version-cache.json"), ttl=6 * 3600, timeout=5):
         self.user = gituser
         self.repo = gitrepo
         self.version_git = gitrepoversionfile
         self.version_local = localversionfile
         self.url = f"https://raw.githubusercontent.com/{gituser}/{gitrepo}/main/{gitrepoversionfile}"
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.timeout = timeout
+        self.remote = None  # The remote version file, once check() has fetched it
 
     @staticmethod
     def is_valid_version(version):
         return bool(re.compile(r"^v\d+(\.\d+){0,2}$").match(version))
 
-    def __fetch(self):
-        """ Fetches the remote version file """
+    def __load_cache(self):
+        try:
+            with open(self.cache_file) as f:
+                cache = json.load(f)
+            if cache.get("url") == self.url and "data" in cache:
+                return cache
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def __save_cache(self, cache):
         try:
-            response = requests.get(self.url)
-        except requests.exceptions.ConnectionError:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(self.cache_file + ".tmp", "w") as f:
+                json.dump(cache, f, indent=4)
+            os.replace(self.cache_file + ".tmp", self.cache_file)
+        except OSError as e:
+            print(f"Failed to cache version file: {e}")
+
+    @staticmethod
+    def __stale(cache):
+        """ An expired cache is still a better answer than none when the fetch fails """
+        if cache is None:
             return -1
-        if response.status_code == 200:
-            return response.json()
+        print("Using the cached version file")
+        return cache["data"]
+
+    def __fetch(self):
+        """ Fetches the remote version file, or returns the cached one while it is fresh """
+        cache = self.__load_cache()
+        if cache and time.time() - cache["fetched_at"] < self.ttl:
+            return cache["data"]
+
+        headers = {}
+        if cache and cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache and cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+        import requests  # Slow to import, and most checks are answered from the cache
+        try:
+            response = requests.get(self.url, headers=headers, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"Error while fetching from {self.url}: {e}")
+            return self.__stale(cache)
+
+        if response.status_code == 304 and cache:
+            cache["fetched_at"] = time.time()
+        elif response.status_code == 200:
+            try:
+                data = response.json()
+            except ValueError as e:
+                print(f"Error while reading {self.url}: {e}")
+                return self.__stale(cache)
+            cache = {
+                "url": self.url,
+                "fetched_at": time.time(),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "data": data,
+            }
         else:
             print(f"Error while fetching from {self.url}, status code: {response.status_code}")
+            return self.__stale(cache)
+        self.__save_cache(cache)
+        return cache["data"]
 
     def __local(self):
         if os.path.exists(self.version_local):
@@ -63,35 +130,184 @@ class UpdateChecker:
         remote_version = self.__fetch()
         if remote_version == -1:
             return -1
+        self.remote = remote_version
         remote_version = remote_version["version"]
 
         return local_version != remote_version, local_version, remote_version
 
-def update(version):
-    url = f"https://raw.githubusercontent.com/ProPythonCoderAya/ScreenSaver/main/update/versions/{version}/ScreenSaver.zip"
+    def digest(self):
+        """The SHA-256 of the update zip published in the remote version file, if there is one."""
+        return self.remote.get("sha256") if isinstance(self.remote, dict) else None
+
+    def check_async(self, callback):
+        """Runs check() on a background thread and calls callback(result) from it when done."""
+        thread = threading.Thread(target=lambda: callback(self.check()), name="update-check", daemon=True)
+        thread.start()
+        return thread
+
+UPDATE_URL = "https://raw.githubusercontent.com/ProPythonCoderAya/ScreenSaver/main/update/versions/{version}/ScreenSaver.zip"
+DOWNLOAD_DIR = os.path.expanduser("~/.screensaver/downloads")
+
+
+class DownloadError(Exception):
+    pass
+
+
+class Downloader:
+    """
+    Streams files to disk through one requests.Session, so the connection is kept between requests.
+
+    The file goes to `path`.part in `chunk_size` chunks and is only moved to `path` once it is
+    complete and its SHA-256 matches, so memory use doesn't grow with the file. If the connection
+    drops, the download goes on from the end of the .part file with an HTTP Range request, up to
+    `retries` times, and a .part file left by an earlier run is picked up the same way.
+    `timeout` is (connect, read) in seconds, and the read timeout is per chunk, not for the whole file.
+    """
+    def __init__(self, timeout=(5, 30), chunk_size=64 * 1024, retries=3):
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        return self._session
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def __hash_part(self, part, digest):
+        """Feeds what an earlier attempt left in `part` to `digest` and returns its size."""
+        if not os.path.exists(part):
+            return 0
+        size = 0
+        with open(part, "rb") as f:
+            while chunk := f.read(self.chunk_size):
+                digest.update(chunk)
+                size += len(chunk)
+        return size
+
+    @staticmethod
+    def __total(response, offset):
+        content_range = response.headers.get("Content-Range", "")  # e.g. "bytes 100-999/1000"
+        if response.status_code == 206 and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            return int(total) if total.isdigit() else None
+        length = response.headers.get("Content-Length")
+        return offset + int(length) if length and length.isdigit() else None
+
+    def download(self, url, path, sha256=None, progress=None):
+        """
+        Downloads `url` to `path` and returns its SHA-256 hex digest.
+        progress(done, total) is called after every chunk, with total None if the server doesn't say.
+        Raises DownloadError if it fails for good or the digest isn't `sha256`.
+        """
+        import requests
+        part = path + ".part"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        digest = hashlib.sha256()
+        done = self.__hash_part(part, digest)
+        if done:
+            print(f"Resuming download of {url} from {done} bytes")
+        validator = None  # ETag or Last-Modified, so a resumed request can't mix two versions of the file
+        attempt = 0
+        while True:
+            # Compressed responses would make the Range offsets mean something else
+            headers = {"Accept-Encoding": "identity"}
+            if done:
+                headers["Range"] = f"bytes={done}-"
+                if validator:
+                    headers["If-Range"] = validator
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code == 416 and done:
+                        break  # Nothing left after the .part file, the digest check below has the last word
+                    if response.status_code == 200 and done:
+                        print("Server ignored the Range request, downloading from the start")
+                        digest = hashlib.sha256()
+                        done = 0
+                    elif response.status_code not in (200, 206):
+                        raise DownloadError(f"Status code {response.status_code} from {url}")
+                    validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                    total = self.__total(response, done)
+                    with open(part, "ab" if done else "wb") as f:
+                        for chunk in response.iter_content(self.chunk_size):
+                            f.write(chunk)
+                            digest.update(chunk)
+                            done += len(chunk)
+                            if progress:
+                                progress(done, total)
+                    if total is not None and done < total:
+                        raise requests.exceptions.ConnectionError(f"Connection closed after {done} of {total} bytes")
+                break
+            except requests.exceptions.RequestException as e:
+                attempt += 1
+                if attempt > self.retries:
+                    raise DownloadError(f"Failed to download {url}: {e}") from e
+                print(f"Download interrupted ({e}), resuming from {done} bytes")
+                time.sleep(attempt)
+
+        hexdigest = digest.hexdigest()
+        if sha256 and hexdigest != sha256.lower():
+            os.remove(part)  # Starting over is the only way to get rid of whatever is wrong in it
+            raise DownloadError(f"SHA-256 of {url} is {hexdigest}, expected {sha256}")
+        os.replace(part, path)
+        return hexdigest
+
+
+def build_library():
+    """Builds the CoreAudio helper the macOS audio probe loads."""
+    shutil.rmtree(abspath("C/dist/"), ignore_errors=True)
+    os.mkdir(abspath("C/dist"))
+    os.system(f""" clang -dynamiclib "{abspath("C/src/main.c")}" -framework CoreAudio -o "{abspath("C/dist/libaudioutil.dylib")}" """.strip())
+    os.system(f""" cp "{abspath("C/dist/libaudioutil.dylib")}" "{abspath("libaudioutil.dylib")}" """.strip())
+
+
+def update(version, sha256=None, progress=None, downloader=None, dst_dir=abspath("../"), rebuild_library=False):
+    """
+    Downloads `version`, checks it against `sha256` and copies its files over the ones in `dst_dir`.
+    `progress` is passed on to Downloader.download(). `downloader` is left open for the caller
+    to reuse, one made here is closed. Returns 0 on success and 1 on failure.
+    """
+    import zipfile  # Only needed when updating, so it is not imported on every launch
+
+    url = UPDATE_URL.format(version=version)
+    zip_path = os.path.join(DOWNLOAD_DIR, f"ScreenSaver-{version}.zip")
     print(f"Downloading update from {url}")
+    if not sha256:
+        print(f"No SHA-256 published for {version}, the download can't be verified")
 
+    own_downloader = downloader is None
+    if own_downloader:
+        downloader = Downloader()
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-    except Exception as e:
+        downloader.download(url, zip_path, sha256=sha256, progress=progress)
+    except DownloadError as e:
         print(f"Failed to get update: {e}")
         return 1
+    finally:
+        # A downloader passed in keeps its session for whatever the caller does next
+        if own_downloader:
+            downloader.close()
 
-    # Extract ZIP from bytes into update/
+    # Extract the ZIP into update/, straight from the file
+    src_dir = abspath("update")
     try:
-        with zipfile.ZipFile(io.BytesIO(response.content)) as zipf:
-            zipf.extractall(abspath("update/"))
+        with zipfile.ZipFile(zip_path) as zipf:
+            zipf.extractall(src_dir)
         print("Extracted update zip")
     except zipfile.BadZipFile as e:
         print(f"Bad ZIP file: {e}")
+        os.remove(zip_path)
         return 1
 
     # Apply the update safely
     try:
-        src_dir = "update"
-        dst_dir = os.path.abspath("../..")  # This is ../
-
         for root, dirs, files in os.walk(src_dir):
             for file in files:
                 src_path = os.path.join(root, file)
@@ -101,10 +317,14 @@ def update(version):
                 os.makedirs(os.path.dirname(dst_path), exist_ok=True)
                 shutil.copy2(src_path, dst_path)
 
-        with open("version.json", "w") as f:
+        with open(abspath("version.json"), "w") as f:
             json.dump({"version": version}, f, indent=4)
 
         shutil.rmtree(src_dir)
+        os.remove(zip_path)
+
+        if rebuild_library:
+            build_library()
 
         print("Update applied successfully!")
     except Exception as e:
@@ -116,11 +336,13 @@ def update(version):
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("-v", "--version", required=True, type=str)
+    parser.add_argument("-s", "--sha256", type=str, help="SHA-256 the downloaded zip must have")
+    parser.add_argument("--rebuild-library", action="store_true", help="Build libaudioutil.dylib again afterwards")
 
     args = parser.parse_args()
     version = args.version
 
-    exit(update(version))
+    exit(update(version, sha256=args.sha256, rebuild_library=args.rebuild_library))
 
 if __name__ == '__main__':
     main()
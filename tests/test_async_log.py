@@ -0,0 +1,99 @@
+import gzip
+import io
+import statistics
+import time
+
+from classes import AsyncLog
+
+
+def open_log(path, **kwargs):
+    log = AsyncLog(str(path), **kwargs)
+    log.console = io.StringIO()
+    return log
+
+
+def read_lines(path, backups):
+    """Every line kept, oldest first: the backups from the highest number down, then the log itself."""
+    lines = []
+    for i in range(backups, 0, -1):
+        backup = path.with_name(f"{path.name}.{i}.gz")
+        if backup.exists():
+            lines += gzip.decompress(backup.read_bytes()).decode().splitlines()
+    return lines + path.read_text().splitlines()
+
+
+def test_writes_are_fast_and_nothing_is_lost(tmp_path):
+    path = tmp_path / "log.log"
+    log = open_log(path, max_bytes=1024 * 1024 * 1024)
+    times = []
+    for i in range(100000):
+        start = time.perf_counter()
+        log.write(f"[DEBUG] line {i} {'x' * 40}\n")
+        times.append(time.perf_counter() - start)
+    log.close()
+
+    assert log.dropped == 0
+    assert path.read_text().splitlines() == [f"[DEBUG] line {i} {'x' * 40}" for i in range(100000)]
+    assert log.console.getvalue() == path.read_text()
+    # A write never waits for the disk, it only appends to a list
+    assert statistics.median(times) < 50e-6
+
+
+def write_in_batches(log, lines, batch=100):
+    """Writes `lines` and waits for the writer after every `batch` of them, so the file rotates several times."""
+    for i, line in enumerate(lines, 1):
+        log.write(line)
+        if i % batch == 0:
+            log._wake.set()
+            while log._pending_size:
+                time.sleep(0.001)
+
+
+def test_rotation_keeps_the_newest_lines_in_order(tmp_path):
+    path = tmp_path / "log.log"
+    log = open_log(path, max_bytes=4096, backups=2)
+    write_in_batches(log, [f"line {i}\n" for i in range(2000)])
+    log.close()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["log.log", "log.log.1.gz", "log.log.2.gz"]
+    kept = read_lines(path, backups=2)
+    assert kept[-1] == "line 1999"
+    first = int(kept[0].split()[1])
+    assert kept == [f"line {i}" for i in range(first, 2000)]
+    assert 0 < path.stat().st_size <= 4096
+    assert len(kept) > 2 * 4096 / len("line 1999\n")  # The backups hold full files
+
+
+def test_no_backups_just_starts_the_file_over(tmp_path):
+    path = tmp_path / "log.log"
+    log = open_log(path, max_bytes=1024, backups=0)
+    write_in_batches(log, [f"line {i}\n" for i in range(1000)], batch=50)
+    log.close()
+    assert [p.name for p in tmp_path.iterdir()] == ["log.log"]
+    lines = path.read_text().splitlines()
+    assert lines[-1] == "line 999"
+    assert path.stat().st_size <= 1024
+
+
+def test_dropped_writes_leave_a_line_in_the_log(tmp_path):
+    path = tmp_path / "log.log"
+    # The writer only wakes up on close, so everything past max_pending is dropped
+    log = open_log(path, max_pending=100, flush_bytes=10 ** 9, flush_interval=60)
+    for i in range(50):
+        log.write(f"line {i:02} is 20 chars\n")
+    log.close()
+
+    assert log.dropped == 45
+    assert path.read_text().splitlines() == [
+        *(f"line {i:02} is 20 chars" for i in range(5)),
+        "[WARN] Log writer fell behind, dropped 45 writes",
+    ]
+
+
+def test_appends_to_an_existing_log(tmp_path):
+    path = tmp_path / "log.log"
+    path.write_text("earlier run\n")
+    log = open_log(path)
+    log.write("this run\n")
+    log.close()
+    assert path.read_text() == "earlier run\nthis run\n"
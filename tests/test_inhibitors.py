@@ -0,0 +1,80 @@
+import sys
+
+import pytest
+
+from inhibitors import Inhibitors
+
+linux_only = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="the probe only runs on Linux")
+
+RUNNING = "state: RUNNING\nowner_pid   : 1234\n"
+IDLE = "closed\n"
+
+
+def stream(root, card, pcm, state):
+    """Writes the status file of substream 0 of `pcm` on `card`, e.g. pcm0p for playback or pcm0c for capture."""
+    status = root / "proc" / "asound" / card / pcm / "sub0" / "status"
+    status.parent.mkdir(parents=True)
+    status.write_text(state)
+    return status
+
+
+@linux_only
+def test_audio_probe_sees_a_running_playback_stream(tmp_path):
+    stream(tmp_path, "card0", "pcm0p", IDLE)
+    stream(tmp_path, "card1", "pcm3p", RUNNING)
+    assert Inhibitors(["audio-linux"], root=str(tmp_path)).check() == "audio playing on card1"
+
+
+@linux_only
+def test_audio_probe_ignores_idle_and_capture_streams(tmp_path):
+    stream(tmp_path, "card0", "pcm0p", IDLE)
+    # A microphone that is recording is not audio playing
+    stream(tmp_path, "card0", "pcm0c", RUNNING)
+    assert Inhibitors(["audio-linux"], root=str(tmp_path)).check() is None
+
+
+def test_audio_probe_is_unavailable_without_asound(tmp_path):
+    assert Inhibitors(["audio-linux"], root=str(tmp_path)).probes == []
+
+
+@linux_only
+def test_answers_are_cached_for_the_probe_ttl(tmp_path):
+    status = stream(tmp_path, "card0", "pcm0p", RUNNING)
+    inhibitors = Inhibitors(["audio-linux"], root=str(tmp_path))
+    assert inhibitors.check() == "audio playing on card0"
+
+    # The stream stops, but the cached answer still stands until the ttl runs out
+    status.write_text(IDLE)
+    assert inhibitors.check() == "audio playing on card0"
+
+    inhibitors.probes[0].ttl = 0
+    assert inhibitors.check() is None
+
+
+@linux_only
+def test_ttl_option_overrides_the_probe_ttl(tmp_path):
+    stream(tmp_path, "card0", "pcm0p", IDLE)
+    inhibitors = Inhibitors(["audio-linux"], root=str(tmp_path), options={"ttl": {"audio-linux": 0.5}})
+    assert inhibitors.probes[0].ttl == 0.5
+
+
+@pytest.mark.parametrize("command, reason", [
+    ("exit 0", "'exit 0' exited with 0"),
+    ("exit 3", None),
+])
+def test_command_probe_reports_the_exit_status(command, reason):
+    assert Inhibitors(["command"], options={"command": command}).check() == reason
+
+
+def test_command_probe_gives_up_on_a_command_that_hangs():
+    inhibitors = Inhibitors(["command"], options={"command": "sleep 5", "command_timeout": 0.1})
+    assert inhibitors.check() is None
+
+
+def test_command_probe_needs_a_command():
+    assert Inhibitors(["command"]).probes == []
+
+
+def test_unknown_probe_names_are_rejected():
+    with pytest.raises(ValueError, match="Unknown probe"):
+        Inhibitors(["audio-linux", "bogus"])
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import textwrap
+import threading
+import time
+
+import pytest
+
+from inhibitors import Inhibitors
+from main import InactivityMonitor, InputSource, SyntheticInput
+
+TIMEOUT = 0.3
+
+# Stands in for matrix.py: notes what it was asked to do in the file given as its first argument
+RENDERER = textwrap.dedent("""
+    import os, sys, time
+
+    def note(line):
+        with open(sys.argv[1], "a") as f:
+            f.write(line + "\\n")
+
+    if "--standby" in sys.argv:
+        note("start")
+        for line in sys.stdin:
+            if line.startswith("show"):
+                note("show")
+                print("dismissed", flush=True)
+        note("quit")
+    else:
+        note("run")
+        if "--hang" in sys.argv:
+            note(f"pid={os.getpid()}")
+            time.sleep(60)
+""")
+
+
+@pytest.fixture
+def renderer(tmp_path):
+    script = tmp_path / "renderer.py"
+    script.write_text(RENDERER)
+    return str(script), tmp_path / "renderer.log"
+
+
+def notes(log):
+    return log.read_text().split() if log.exists() else []
+
+
+async def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+class ScriptedInhibitors:
+    """Holds the screensaver off for the first `times` checks, noting when each check was made."""
+    def __init__(self, monitor_delay, times):
+        self.monitor_delay = monitor_delay
+        self.times = times
+        self.checks = []  # (time.monotonic(), the monitor's recheck_delay at that point)
+
+    def check(self):
+        self.checks.append((time.monotonic(), self.monitor_delay()))
+        return "scripted" if len(self.checks) <= self.times else None
+
+
+def monitor_for(file_to_open="renderer.py", *args, **kwargs):
+    kwargs.setdefault("inhibitors", Inhibitors(names=[]))
+    kwargs.setdefault("input_source", SyntheticInput())
+    return InactivityMonitor(TIMEOUT, "Seconds", file_to_open, *args, **kwargs)
+
+
+def test_input_flood_keeps_one_deadline_and_a_constant_thread_count():
+    monitor = monitor_for()
+    sent = []
+    thread_counts = set()
+    floods = []
+
+    def other_threads():
+        return len([thread for thread in threading.enumerate() if thread not in floods])
+
+    def flood(until):
+        count = 0
+        while time.monotonic() < until:
+            monitor.input.send(0, 0)
+            count += 1
+            if count % 10000 == 0:
+                thread_counts.add(other_threads())
+        sent.append(count)
+
+    async def scenario():
+        monitor.loop = asyncio.get_running_loop()
+        monitor.reset_timer()
+        monitor.input.start(monitor.on_input)
+        idle = asyncio.create_task(monitor.wait_for_idle())
+        until = time.monotonic() + 1.0
+        baseline = other_threads()
+        floods.extend(threading.Thread(target=flood, args=(until,)) for _ in range(4))
+        for thread in floods:
+            thread.start()
+        while any(thread.is_alive() for thread in floods):
+            await asyncio.sleep(0.05)
+        last_input = monitor.last_activity
+        await idle
+        return baseline, time.monotonic() - last_input
+
+    baseline, idle_after = asyncio.run(scenario())
+
+    assert sum(sent) > 100000
+    # Input only moves a timestamp: no timer or thread per event, and the deadline fires a few times, not per event
+    assert thread_counts == {baseline}
+    assert monitor.wakeups <= 1.0 / TIMEOUT + 2
+    assert idle_after >= TIMEOUT
+
+
+def test_input_source_needs_start():
+    with pytest.raises(TypeError):
+        InputSource()
+
+
+def test_idle_runs_the_renderer_once_after_a_burst_of_input(renderer):
+    script, log = renderer
+    monitor = monitor_for(script, str(log))
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        # A burst of input spread over the first 0.4 s, each one in time to push the deadline back
+        for i in range(2000):
+            loop.call_later(i * 0.0002, monitor.input.send, 0, 0)
+        loop.call_later(0.4, monitor.input.send, 0, 0)
+        started = time.monotonic()
+        rc = await monitor.serve()
+        return rc, time.monotonic() - started
+
+    rc, elapsed = asyncio.run(scenario())
+    assert rc == 0
+    assert notes(log) == ["run"]
+    assert elapsed >= 0.4 + TIMEOUT
+    assert monitor.wakeups <= 3
+
+
+def test_inhibitor_defers_the_run_with_a_doubling_backoff(renderer):
+    script, log = renderer
+    monitor = monitor_for(script, str(log), recheck=0.05, max_recheck=0.2)
+    monitor.inhibitors = inhibitors = ScriptedInhibitors(lambda: monitor.recheck_delay, times=4)
+
+    assert asyncio.run(monitor.serve()) == 0
+    assert notes(log) == ["run"]
+    assert len(inhibitors.checks) == 5
+    # The delay before each next check doubles until it reaches max_recheck
+    assert [delay for _, delay in inhibitors.checks] == [0.05, 0.1, 0.2, 0.2, 0.2]
+    gaps = [b - a for (a, _), (b, _) in zip(inhibitors.checks, inhibitors.checks[1:])]
+    for gap, delay in zip(gaps, [0.05, 0.1, 0.2, 0.2]):
+        assert gap >= delay
+
+
+def test_standby_renderer_is_dismissed_and_goes_back_on_standby(renderer):
+    script, log = renderer
+    monitor = monitor_for(script, str(log), standby=True)
+
+    async def scenario():
+        serve = asyncio.create_task(monitor.serve())
+        await wait_for(lambda: notes(log).count("show") == 2)
+        assert monitor.renderer_alive()
+        serve.cancel()
+        return await serve
+
+    assert asyncio.run(scenario()) == 0
+    # One warm renderer, shown twice, told to quit when serve() was cancelled
+    assert notes(log) == ["start", "show", "show", "quit"]
+    assert monitor.renderer is None
+
+
+def test_cancelling_serve_quits_a_running_renderer(renderer):
+    script, log = renderer
+    monitor = monitor_for(script, str(log), "--hang")
+
+    async def scenario():
+        serve = asyncio.create_task(monitor.serve())
+        await wait_for(lambda: len(notes(log)) == 2)
+        started = time.monotonic()
+        serve.cancel()
+        rc = await serve
+        return rc, time.monotonic() - started
+
+    rc, took = asyncio.run(scenario())
+    assert rc == 0
+    assert took < 5
+    run, pid = notes(log)
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pid.removeprefix("pid=")), 0)
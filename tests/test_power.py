@@ -0,0 +1,80 @@
+import sys
+
+import pytest
+
+from power import DEFAULTS, PowerMonitor, read_linux, with_defaults
+
+
+def supply(root, name, **files):
+    """Writes a fake sysfs power supply: supply(root, "AC", type="Mains", online="1")."""
+    path = root / "sys" / "class" / "power_supply" / name
+    path.mkdir(parents=True)
+    for key, value in files.items():
+        (path / key).write_text(value + "\n")
+
+
+def test_with_defaults_fills_in_a_missing_section():
+    assert with_defaults(None) == DEFAULTS
+    assert with_defaults(None) is not DEFAULTS
+
+
+def test_with_defaults_keeps_what_the_user_set():
+    section = with_defaults({"fps": 5, "blank_after": 60})
+    assert section == {**DEFAULTS, "fps": 5, "blank_after": 60}
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads sysfs")
+def test_monitor_uses_the_same_defaults(tmp_path):
+    # An empty sysfs root has no power supplies, so the machine counts as on AC
+    monitor = PowerMonitor({"fps": 5}, root=str(tmp_path))
+    assert monitor.config == with_defaults({"fps": 5})
+    assert not monitor.low_power
+
+
+def test_mains_online_is_ac_power(tmp_path):
+    supply(tmp_path, "AC", type="Mains", online="1")
+    supply(tmp_path, "BAT0", type="Battery", status="Charging", capacity="80")
+    state = read_linux(str(tmp_path))
+    assert (state.on_battery, state.percent) == (False, 80)
+
+
+def test_mains_offline_with_a_discharging_battery_is_battery_power(tmp_path):
+    supply(tmp_path, "AC", type="Mains", online="0")
+    supply(tmp_path, "BAT0", type="Battery", status="Discharging", capacity="55")
+    state = read_linux(str(tmp_path))
+    assert (state.on_battery, state.percent) == (True, 55)
+
+
+def test_battery_status_decides_without_a_mains_entry(tmp_path):
+    supply(tmp_path, "BAT0", type="Battery", status="Discharging", capacity="55")
+    assert read_linux(str(tmp_path)).on_battery
+
+
+def test_peripheral_batteries_are_ignored(tmp_path):
+    supply(tmp_path, "AC", type="Mains", online="1")
+    # A wireless mouse running low must not count as the machine's battery
+    supply(tmp_path, "hidpp_battery_0", type="Battery", scope="Device", status="Discharging", capacity="5")
+    state = read_linux(str(tmp_path))
+    assert (state.on_battery, state.percent) == (False, None)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads sysfs")
+@pytest.mark.parametrize("capacity, low_power", [("20", True), ("21", False)])
+def test_monitor_switches_to_low_power_at_or_below_battery_below(tmp_path, capacity, low_power):
+    supply(tmp_path, "AC", type="Mains", online="0")
+    supply(tmp_path, "BAT0", type="Battery", status="Discharging", capacity=capacity)
+    monitor = PowerMonitor({"battery_below": 20, "fps": 5}, root=str(tmp_path))
+    assert monitor.low_power is low_power
+    assert monitor.fps == (5 if low_power else None)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads sysfs")
+def test_poll_notices_the_mains_coming_back(tmp_path):
+    supply(tmp_path, "AC", type="Mains", online="0")
+    supply(tmp_path, "BAT0", type="Battery", status="Discharging", capacity="40")
+    monitor = PowerMonitor({"check_interval": 0}, root=str(tmp_path))
+    assert monitor.low_power
+
+    (tmp_path / "sys" / "class" / "power_supply" / "AC" / "online").write_text("1\n")
+    assert monitor.poll()
+    assert not monitor.low_power
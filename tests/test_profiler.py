@@ -0,0 +1,38 @@
+import random
+
+import numpy as np
+import pytest
+
+from profiler import BUCKETS_MS, Histogram
+
+
+def histogram(values):
+    h = Histogram()
+    for value in values:
+        h.add(value)
+    return h
+
+
+def test_percentiles_of_frames_around_the_frame_budget_are_within_a_bucket():
+    rng = random.Random(1)
+    # 20 fps with a little jitter and one slow frame, like a real run
+    values = [rng.gauss(50.3, 0.8) for _ in range(2000)] + [57.958]
+    h = histogram(values)
+    for p in (50, 95, 99):
+        assert h.percentile(p) == pytest.approx(np.percentile(values, p), abs=1.0)
+    assert h.percentile(50) < h.percentile(99) < h.max
+
+
+def test_values_on_a_bound_go_in_the_bucket_it_closes():
+    h = histogram([1, 50, 50.5, BUCKETS_MS[-1] + 1])
+    assert h.as_dict()["histogram_ms"] == {"<=1": 1, "<=50": 1, "<=51": 1, f">{BUCKETS_MS[-1]}": 1}
+
+
+def test_percentiles_stay_between_the_smallest_and_largest_value():
+    h = histogram([33.2] * 10)
+    assert h.percentile(1) == h.percentile(50) == h.percentile(99) == 33.2
+    assert histogram([2000.0, 3000.0]).percentile(99) <= 3000.0
+
+
+def test_empty_histogram():
+    assert Histogram().as_dict()["p99_ms"] == 0.0
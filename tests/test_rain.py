@@ -0,0 +1,103 @@
+import numpy as np
+import pygame
+import pytest
+
+from rain import MatrixRain
+
+
+@pytest.fixture
+def screen():
+    # No pygame.quit() afterwards: it would free the fonts classes keeps cached between tests
+    pygame.init()
+    return pygame.display.set_mode((320, 240))
+
+
+def shown(rain, screen):
+    rain.step()
+    return shown_without_step(rain, screen)
+
+
+def shown_without_step(rain, screen):
+    rain.render(screen)
+    return pygame.surfarray.array3d(screen)
+
+
+@pytest.mark.parametrize("renderer", ["dirty", "pixels"])
+def test_invalidate_redraws_a_surface_that_was_cleared_behind_its_back(screen, renderer):
+    rain = MatrixRain(320, 240, renderer=renderer, seed=3)
+    for _ in range(5):
+        shown(rain, screen)
+
+    # What hide() and show() do to the window, without a new Surface object
+    screen.fill((255, 0, 0))
+    rain.invalidate()
+    frame = shown(rain, screen)
+
+    # The same rain, drawn to a surface nothing else touched
+    reference, surface = MatrixRain(320, 240, renderer=renderer, seed=3), pygame.Surface((320, 240))
+    for _ in range(6):
+        expected = shown(reference, surface)
+    assert np.array_equal(frame, expected)
+
+
+def test_dirty_renderer_returns_the_whole_surface_after_invalidate(screen):
+    rain = MatrixRain(320, 240, renderer="dirty", seed=3)
+    shown(rain, screen)
+    rain.step()
+    assert screen.get_rect() not in rain.render(screen)
+
+    rain.invalidate()
+    rain.step()
+    assert rain.render(screen) == [screen.get_rect()]
+
+
+def draw_trail(rain, column, top, cells):
+    """Sets this frame's draws to one continuous trail, `cells` long, in `column` from `top` down."""
+    rain.draw_x = np.full(cells, column * rain.font_size, dtype=np.int64)
+    rain.draw_y = top + np.arange(cells, dtype=np.int64) * rain.font_size
+    rain.draw_area = np.arange(cells, dtype=np.int64) % len(rain.atlas_areas)
+
+
+def test_a_moving_trail_is_one_update_rect(screen):
+    rain = MatrixRain(320, 240, renderer="dirty", seed=3)
+    draw_trail(rain, column=2, top=0, cells=8)
+    rain.render(screen)
+
+    draw_trail(rain, column=2, top=rain.font_size, cells=8)
+    rects = rain.render(screen)
+    assert len(rects) == 1
+    assert rects[0].x == 2 * rain.font_size
+    assert rects[0].top == 0
+    assert rects[0].bottom >= 8 * rain.font_size + rain.glyph_height
+
+
+def test_dirty_frames_match_full_frames(screen):
+    dirty, full = MatrixRain(320, 240, renderer="dirty", seed=5), MatrixRain(320, 240, renderer="full", seed=5)
+    surface = pygame.Surface((320, 240))
+    for _ in range(40):
+        # Where trails overlap the glyphs blend in a different order, so only compare what is lit
+        assert np.array_equal(shown(dirty, screen)[..., 1] > 0, shown(full, surface)[..., 1] > 0)
+
+
+@pytest.mark.parametrize("size", [(300, 200), (400, 300)])
+def test_pixels_renderer_crops_to_a_surface_of_another_size(screen, size):
+    rain, reference = MatrixRain(320, 240, renderer="pixels", seed=3), MatrixRain(320, 240, renderer="pixels", seed=3)
+    surface = pygame.Surface(size)
+    for _ in range(10):
+        frame, expected = shown(rain, surface), shown(reference, screen)
+    cols = min(rain.cols, size[0] // rain.font_size) * rain.font_size
+    height = min(240, size[1])
+    assert np.array_equal(frame[:cols, :height], expected[:cols, :height])
+
+
+def test_pixels_renderer_saturates_where_glyphs_overlap(screen):
+    rain = MatrixRain(320, 240, renderer="pixels", seed=3)
+    draw_trail(rain, column=2, top=0, cells=1)
+    single = shown_without_step(rain, screen)
+
+    # The same brightest glyph drawn twice on one cell, and once more a pixel lower
+    rain.draw_x, rain.draw_y = np.repeat(rain.draw_x, 3), np.array([0, 0, 1])
+    rain.draw_area = np.repeat(rain.draw_area, 3)
+    stacked = shown_without_step(rain, screen)
+    assert stacked[..., 1].max() == 255
+    assert np.all(stacked[..., 1] >= single[..., 1])
@@ -0,0 +1,59 @@
+import threading
+
+import pygame
+
+import classes
+from classes import TextCache
+
+
+class RecordingFont:
+    """Notes whether the cache's lock was held for every render."""
+    def __init__(self, cache):
+        self.cache = cache
+        self.locked = []
+
+    def render(self, text, antialias, color):
+        self.locked.append(self.cache._lock.locked())
+        return pygame.Surface((len(text) + 1, 10))
+
+
+def test_fonts_only_render_with_the_lock_held(monkeypatch):
+    cache = TextCache()
+    font = RecordingFont(cache)
+    monkeypatch.setattr(classes, "get_font", lambda name, size: font)
+    cache.render("comicsans", 22, "Run", (0, 0, 0))
+    cache.render("comicsans", 22, "Running...", (0, 0, 0))
+    assert font.locked == [True, True]
+
+
+def test_hits_return_the_same_surface_and_evict_the_oldest():
+    pygame.init()
+    cache = TextCache(max_entries=2)
+    first = cache.render(None, 20, "a", (0, 0, 0))
+    assert cache.render(None, 20, "a", (0, 0, 0)) is first
+    cache.render(None, 20, "b", (0, 0, 0))
+    cache.render(None, 20, "c", (0, 0, 0))
+    assert cache.render(None, 20, "a", (0, 0, 0)) is not first
+    assert (cache.hits, cache.misses) == (1, 4)
+
+
+def test_rendering_from_several_threads_at_once():
+    pygame.init()
+    cache = TextCache(max_entries=8)
+    errors = []
+
+    def render(thread):
+        try:
+            for i in range(300):
+                cache.render("comicsans", 22, f"{thread} {i % 20}", (0, 0, 0))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=render, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert cache.hits + cache.misses == 1200
+    assert cache.stats()["entries"] <= 8
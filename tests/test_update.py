@@ -0,0 +1,306 @@
+import hashlib
+import http.server
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+import update
+from update import Downloader, DownloadError, UpdateChecker
+
+VERSION_FILE = json.dumps({"version": "v1.0.6"}).encode()
+ETAG = '"abc123"'
+LAST_MODIFIED = "Sat, 17 Oct 2026 12:00:00 GMT"
+
+
+class Server:
+    """A local stand-in for raw.githubusercontent.com, noting the headers of every request."""
+    def __init__(self, handler):
+        self.requests = []
+        self.mode = "ok"
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.stand_in = self
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class VersionHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server.stand_in
+        server.requests.append(dict(self.headers))
+        if server.mode == "slow":
+            time.sleep(1)
+        if server.mode == "error":
+            self.send_response(503)
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = b"{not json" if server.mode == "bad-json" else VERSION_FILE
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = Server(VersionHandler)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def checker(server, tmp_path):
+    checker = UpdateChecker("user", "repo", "update/version.json", str(tmp_path / "version.json"),
+                            cache_file=str(tmp_path / "cache.json"), ttl=60, timeout=0.3)
+    checker.url = server.url + "/version.json"
+    return checker
+
+
+def test_a_200_fills_the_cache(server, checker):
+    assert checker.check() == (True, "v0.0.0", "v1.0.6")
+    with open(checker.cache_file) as f:
+        cache = json.load(f)
+    assert cache["data"] == {"version": "v1.0.6"}
+    assert cache["etag"] == ETAG
+    assert cache["last_modified"] == LAST_MODIFIED
+    assert len(server.requests) == 1
+
+
+def test_a_check_within_the_ttl_makes_no_request(server, checker):
+    checker.check()
+    assert checker.check() == (True, "v0.0.0", "v1.0.6")
+    assert len(server.requests) == 1
+
+
+def test_a_check_after_the_ttl_is_conditional_and_handles_a_304(server, checker):
+    checker.check()
+    with open(checker.cache_file) as f:
+        cache = json.load(f)
+    cache["fetched_at"] -= checker.ttl + 1
+    with open(checker.cache_file, "w") as f:
+        json.dump(cache, f)
+
+    assert checker.check() == (True, "v0.0.0", "v1.0.6")
+    headers = server.requests[-1]
+    assert headers["If-None-Match"] == ETAG
+    assert headers["If-Modified-Since"] == LAST_MODIFIED
+    with open(checker.cache_file) as f:
+        assert time.time() - json.load(f)["fetched_at"] < 5  # Fresh again
+
+
+@pytest.mark.parametrize("mode", ["slow", "error", "bad-json"])
+def test_failures_return_minus_one(server, checker, mode):
+    server.mode = mode
+    assert checker.check() == -1
+
+
+@pytest.mark.parametrize("mode", ["slow", "error", "bad-json"])
+def test_a_failed_check_after_the_ttl_falls_back_to_the_expired_cache(server, checker, mode):
+    checker.check()
+    with open(checker.cache_file) as f:
+        cache = json.load(f)
+    cache["fetched_at"] -= checker.ttl + 1
+    del cache["etag"]  # Or the server would just answer 304
+    with open(checker.cache_file, "w") as f:
+        json.dump(cache, f)
+
+    server.mode = mode
+    assert checker.check() == (True, "v0.0.0", "v1.0.6")
+    assert len(server.requests) == 2
+    with open(checker.cache_file) as f:
+        assert json.load(f) == cache  # Still expired, so the next check tries again
+
+
+def test_a_failed_check_caches_nothing(server, checker):
+    server.mode = "error"
+    checker.check()
+    assert not os.path.exists(checker.cache_file)
+    server.mode = "ok"
+    assert checker.check() == (True, "v0.0.0", "v1.0.6")
+
+
+# --- Downloads ---
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves server.data with Range support, unless server.mode is "no-range". Cuts the
+    connection a third of the way into the body while server.cuts is above 0.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server.stand_in
+        server.requests.append(dict(self.headers))
+        data = server.data
+        start = 0
+        if self.headers.get("Range") and server.mode != "no-range":
+            start = int(self.headers["Range"].removeprefix("bytes=").rstrip("-"))
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(data) - start))
+        self.end_headers()
+        body = memoryview(data)[start:]
+        if server.cuts:
+            server.cuts -= 1
+            self.wfile.write(body[:len(body) // 3])
+            self.close_connection = True
+            return
+        for i in range(0, len(body), 1 << 20):
+            self.wfile.write(body[i:i + (1 << 20)])
+
+
+@pytest.fixture
+def files():
+    server = Server(RangeHandler)
+    server.data = os.urandom(4 * 1024 * 1024)
+    server.cuts = 0
+    yield server
+    server.close()
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def downloader():
+    downloader = Downloader(timeout=(2, 2), chunk_size=64 * 1024)
+    yield downloader
+    downloader.close()
+
+
+def test_download_streams_to_the_file_and_reports_progress(files, downloader, tmp_path):
+    path = str(tmp_path / "ScreenSaver.zip")
+    progress = []
+    digest = downloader.download(files.url + "/ScreenSaver.zip", path, sha256=sha256(files.data),
+                                 progress=lambda done, total: progress.append((done, total)))
+    assert digest == sha256(files.data)
+    with open(path, "rb") as f:
+        assert f.read() == files.data
+    assert not os.path.exists(path + ".part")
+    assert progress[-1] == (len(files.data), len(files.data))
+    assert len(progress) >= len(files.data) // (64 * 1024)
+
+
+def test_an_interrupted_download_resumes_with_a_range_request(files, downloader, tmp_path, monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    path = str(tmp_path / "ScreenSaver.zip")
+    files.cuts = 1
+    assert downloader.download(files.url, path, sha256=sha256(files.data)) == sha256(files.data)
+    first, resumed = files.requests
+    assert "Range" not in first
+    offset = int(resumed["Range"].removeprefix("bytes=").rstrip("-"))
+    assert 0 < offset < len(files.data)
+    assert resumed["If-Range"] == ETAG
+    with open(path, "rb") as f:
+        assert f.read() == files.data
+
+
+def test_a_part_file_from_an_earlier_run_is_picked_up(files, downloader, tmp_path):
+    path = str(tmp_path / "ScreenSaver.zip")
+    with open(path + ".part", "wb") as f:
+        f.write(files.data[:1000000])
+    assert downloader.download(files.url, path, sha256=sha256(files.data)) == sha256(files.data)
+    assert files.requests[0]["Range"] == "bytes=1000000-"
+
+
+def test_a_complete_part_file_gets_a_416_and_is_still_verified(files, downloader, tmp_path):
+    path = str(tmp_path / "ScreenSaver.zip")
+    with open(path + ".part", "wb") as f:
+        f.write(files.data)
+    assert downloader.download(files.url, path, sha256=sha256(files.data)) == sha256(files.data)
+    assert len(files.requests) == 1
+
+
+def test_a_server_without_range_support_starts_over(files, downloader, tmp_path):
+    path = str(tmp_path / "ScreenSaver.zip")
+    files.mode = "no-range"
+    with open(path + ".part", "wb") as f:
+        f.write(b"x" * 1000)
+    assert downloader.download(files.url, path, sha256=sha256(files.data)) == sha256(files.data)
+    with open(path, "rb") as f:
+        assert f.read() == files.data
+
+
+def test_a_wrong_digest_fails_and_removes_the_part_file(files, downloader, tmp_path):
+    path = str(tmp_path / "ScreenSaver.zip")
+    with pytest.raises(DownloadError, match="SHA-256"):
+        downloader.download(files.url, path, sha256="0" * 64)
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + ".part")
+
+
+def test_giving_up_after_the_retries(files, tmp_path, monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    files.cuts = 10
+    downloader = Downloader(timeout=(2, 2), retries=2)
+    with pytest.raises(DownloadError):
+        downloader.download(files.url, str(tmp_path / "ScreenSaver.zip"))
+    assert len(files.requests) == 3
+    downloader.close()
+
+
+def test_memory_stays_flat_whatever_the_size(files, downloader, tmp_path):
+    peaks = []
+    for size in (4, 32):
+        files.data = os.urandom(size * 1024 * 1024)
+        tracemalloc.start()
+        downloader.download(files.url, str(tmp_path / f"{size}.zip"), sha256=sha256(files.data))
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    # The server runs in this process too, and it sends 1 MiB at a time
+    assert peaks[1] < 8 * 1024 * 1024
+    assert peaks[1] - peaks[0] < 1024 * 1024
+
+
+class RecordingDownloader(Downloader):
+    def __init__(self):
+        super().__init__()
+        self.closed = False
+
+    def download(self, url, path, sha256=None, progress=None):
+        raise DownloadError("offline")
+
+    def close(self):
+        self.closed = True
+
+
+def test_update_leaves_a_downloader_it_was_given_open(monkeypatch, tmp_path):
+    monkeypatch.setattr(update, "DOWNLOAD_DIR", str(tmp_path))
+    given = RecordingDownloader()
+    assert update.update("v9.9.9", downloader=given) == 1
+    assert not given.closed
+
+
+def test_update_closes_a_downloader_it_made(monkeypatch, tmp_path):
+    monkeypatch.setattr(update, "DOWNLOAD_DIR", str(tmp_path))
+    made = []
+    monkeypatch.setattr(update, "Downloader", lambda: made.append(RecordingDownloader()) or made[-1])
+    assert update.update("v9.9.9") == 1
+    assert made[0].closed
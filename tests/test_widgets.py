@@ -0,0 +1,109 @@
+import pygame
+import pytest
+
+from classes import BasePoolObject, Button, ObjectPool, TextBox
+
+
+@pytest.fixture
+def win():
+    # No pygame.quit() afterwards: it would free the fonts classes keeps cached between tests
+    pygame.init()
+    return pygame.display.set_mode((400, 300))
+
+
+@pytest.fixture
+def widgets(win):
+    button = Button(100, 100, 120, 40, (220, 220, 220), (240, 240, 240), (0, 0, 0), "Run", font_size=22)
+    box = TextBox(250, 30, 60, 30, max_chars=3, start_text="3", color=(220, 220, 220), text_color=(0, 0, 0),
+                  start_text_color=(120, 120, 120), font_size=22)
+    pool = ObjectPool()
+    pool.add(button)
+    pool.add(box)
+    pool.draw(win)
+    assert not pool.dirty
+    return pool, button, box
+
+
+def motion(pos):
+    return pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(0, 0, 0))
+
+
+def click(pos):
+    return pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1)
+
+
+def key(char, code=None):
+    return pygame.event.Event(pygame.KEYDOWN, key=code if code is not None else ord(char), unicode=char, mod=0)
+
+
+def dirtied(pool, win, *events):
+    """Whether `events` made the pool dirty, drawing it clean again afterwards."""
+    pool.update(list(events))
+    dirty = pool.dirty
+    pool.draw(win)
+    return dirty
+
+
+def test_nothing_happening_keeps_the_pool_clean(widgets, win):
+    pool, _, box = widgets
+    renders = BasePoolObject.renders
+    for _ in range(100):
+        box._last_blink -= 1  # Blink intervals pass, but the box isn't active
+        assert not dirtied(pool, win)
+    assert BasePoolObject.renders == renders
+
+
+def test_hover_only_dirties_when_it_changes(widgets, win):
+    pool, button, _ = widgets
+    assert not dirtied(pool, win, motion((5, 5)))
+    assert dirtied(pool, win, motion((100, 100)))
+    assert button.is_hovered()
+    assert not dirtied(pool, win, motion((101, 101)), motion((110, 95)))
+    assert dirtied(pool, win, motion((5, 5)))
+    assert not button.is_hovered()
+
+
+def test_text_changes_dirty_the_box(widgets, win):
+    pool, _, box = widgets
+    assert not dirtied(pool, win, key("7"))  # Not active yet
+    assert dirtied(pool, win, click((260, 40)))
+    assert dirtied(pool, win, key("7"))
+    assert not dirtied(pool, win, key("\t"))  # Control characters aren't typed
+    assert dirtied(pool, win, key("", pygame.K_BACKSPACE))
+    box.text = "123"
+    assert not dirtied(pool, win, key("4"))  # Already at max_chars
+    assert dirtied(pool, win, click((5, 5)))  # Clicking elsewhere deactivates it
+    assert not box.active
+
+
+def test_cursor_blink_dirties_an_active_box(widgets, win):
+    pool, _, box = widgets
+    dirtied(pool, win, click((260, 40)))
+    assert not dirtied(pool, win)
+    box._last_blink -= box._blink_interval
+    assert dirtied(pool, win)
+    assert box.next_blink() > 0
+
+
+def test_enable_and_disable_only_dirty_when_they_change(widgets, win):
+    pool, button, _ = widgets
+    button.disable()
+    assert pool.dirty
+    pool.draw(win)
+    button.disable()
+    assert not pool.dirty
+    button.enable()
+    assert pool.dirty
+    pool.draw(win)
+    button.enable()
+    assert not pool.dirty
+
+
+def test_a_click_is_reported_once(widgets, win):
+    pool, button, _ = widgets
+    pool.update([click((100, 100))])
+    assert button.is_clicked()
+    assert not button.is_clicked()
+    button.disable()
+    pool.update([click((100, 100))])
+    assert not button.is_clicked()